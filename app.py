@@ -4,15 +4,21 @@ Streamlit-приложение для визуализации результа
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import os
 import json
-from datetime import datetime
+from datetime import datetime, date
 
-from data_loader import BacktestDataLoader, get_available_data_folders
+from data_loader import BacktestDataLoader, get_available_data_folders, folder_fingerprint, DATA_FILE_EXTENSIONS
 from visualizations import BacktestVisualizer
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Настройка страницы
 st.set_page_config(
     page_title="Backtest Dashboard",
@@ -25,40 +31,58 @@ st.set_page_config(
 st.title("📊 Backtest Dashboard")
 st.markdown("---")
 
+# Типы графиков на вкладке PNL
+CHART_TYPES = ("PNL по сделкам", "Накопленный PNL", "PNL по времени", "Распределение PNL")
+CHART_INDEX = {chart: i for i, chart in enumerate(CHART_TYPES)}
+# Тип графика -> (метод BacktestVisualizer, шаблон заголовка)
+CHART_HANDLERS = {
+    "PNL по сделкам": ("plot_pnl_by_trades", "PNL по сделкам - {symbols}"),
+    "Накопленный PNL": ("plot_cumulative_pnl", "Накопленный PNL - {symbols}"),
+    "PNL по времени": ("plot_pnl_timeline", "PNL по времени - {symbols}"),
+    "Распределение PNL": ("plot_pnl_distribution", "Распределение PNL по стратегиям"),
+}
+
 # Функции для работы с настройками
-def export_settings(selected_symbols, selected_strategies, start_date, end_date, chart_type, show_columns, max_rows, data_folder=None):
-    """Экспортирует текущие настройки в JSON формат."""
-    settings = {
-        "data_folder": data_folder,
-        "selected_symbols": selected_symbols,
-        "selected_strategies": selected_strategies,
-        "start_date": start_date.strftime('%Y-%m-%d') if start_date else None,
-        "end_date": end_date.strftime('%Y-%m-%d') if end_date else None,
-        "chart_type": chart_type,
-        "show_columns": show_columns,
-        "max_rows": max_rows,
-        "export_timestamp": datetime.now().isoformat()
-    }
+def _settings_dumps(settings: dict) -> str:
+    """Сериализует настройки в JSON (через orjson, если он установлен)."""
+    if orjson is not None:
+        return orjson.dumps(settings, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
     return json.dumps(settings, ensure_ascii=False, indent=2)
 
-def save_default_settings(selected_symbols, selected_strategies, start_date, end_date, chart_type, show_columns, max_rows, data_folder):
-    """Сохраняет текущие настройки как настройки по умолчанию в example_settings.json."""
+def _settings_loads(data) -> dict:
+    """Разбирает JSON с настройками из bytes или str (через orjson, если он установлен)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def export_settings(settings: dict) -> str:
+    """
+    Экспортирует настройки в JSON формат.
+    
+    Args:
+        settings: Готовый словарь настроек (даты — строки YYYY-MM-DD)
+        
+    Returns:
+        str: JSON с настройками и временем экспорта
+    """
+    return _settings_dumps({**settings, "export_timestamp": datetime.now().isoformat()})
+
+def save_default_settings(settings: dict):
+    """
+    Сохраняет настройки как настройки по умолчанию в example_settings.json.
+    
+    Args:
+        settings: Готовый словарь настроек (даты — строки YYYY-MM-DD)
+    """
     settings = {
-        "data_folder": data_folder,
-        "selected_symbols": selected_symbols,
-        "selected_strategies": selected_strategies,
-        "start_date": start_date.strftime('%Y-%m-%d') if start_date else None,
-        "end_date": end_date.strftime('%Y-%m-%d') if end_date else None,
-        "chart_type": chart_type,
-        "show_columns": show_columns,
-        "max_rows": max_rows,
+        **settings,
         "saved_as_default": True,
         "saved_timestamp": datetime.now().isoformat()
     }
     
     try:
         with open('example_settings.json', 'w', encoding='utf-8') as f:
-            json.dump(settings, f, ensure_ascii=False, indent=2)
+            f.write(_settings_dumps(settings))
         return True, "Настройки успешно сохранены как настройки по умолчанию!"
     except Exception as e:
         return False, f"Ошибка при сохранении настроек: {str(e)}"
@@ -66,12 +90,19 @@ def save_default_settings(selected_symbols, selected_strategies, start_date, end
 def import_settings(uploaded_file):
     """Импортирует настройки из JSON файла."""
     try:
-        settings = json.load(uploaded_file)
+        settings = _settings_loads(uploaded_file.read())
         return settings
     except Exception as e:
         st.error(f"Ошибка при загрузке настроек: {str(e)}")
         return None
 
+def _parse_settings_date(value: str) -> date:
+    """Разбирает дату из настроек: быстрый путь для YYYY-MM-DD, остальные форматы через pandas."""
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return pd.to_datetime(value).date()
+
 def apply_settings(settings, symbols, strategies, min_date, max_date):
     """Применяет загруженные настройки к интерфейсу."""
     if not settings:
@@ -86,15 +117,17 @@ def apply_settings(settings, symbols, strategies, min_date, max_date):
     selected_symbols = settings.get('selected_symbols', symbols[:5] if len(symbols) > 5 else symbols)
     selected_strategies = settings.get('selected_strategies', strategies[:3] if len(strategies) > 3 else strategies)
     
-    # Проверяем, что выбранные символы и стратегии существуют
-    selected_symbols = [s for s in selected_symbols if s in symbols]
-    selected_strategies = [s for s in selected_strategies if s in strategies]
+    # Проверяем, что выбранные символы и стратегии существуют (через множества — O(1) на проверку)
+    symbol_set = set(symbols)
+    strategy_set = set(strategies)
+    selected_symbols = [s for s in selected_symbols if s in symbol_set]
+    selected_strategies = [s for s in selected_strategies if s in strategy_set]
     
     # Если ничего не выбрано, используем значения по умолчанию
     if not selected_symbols:
-        selected_symbols = symbols[:5] if len(symbols) > 5 else symbols
+        selected_symbols = list(symbols[:5])
     if not selected_strategies:
-        selected_strategies = strategies[:3] if len(strategies) > 3 else strategies
+        selected_strategies = list(strategies[:3])
     
     # Обработка дат
     start_date_str = settings.get('start_date')
@@ -105,7 +138,7 @@ def apply_settings(settings, symbols, strategies, min_date, max_date):
     
     if start_date_str and min_date:
         try:
-            start_date = pd.to_datetime(start_date_str).date()
+            start_date = _parse_settings_date(start_date_str)
             if start_date < min_date.date():
                 start_date = min_date.date()
             if start_date > max_date.date():
@@ -115,7 +148,7 @@ def apply_settings(settings, symbols, strategies, min_date, max_date):
     
     if end_date_str and max_date:
         try:
-            end_date = pd.to_datetime(end_date_str).date()
+            end_date = _parse_settings_date(end_date_str)
             if end_date < min_date.date():
                 end_date = min_date.date()
             if end_date > max_date.date():
@@ -129,13 +162,175 @@ def apply_settings(settings, symbols, strategies, min_date, max_date):
     
     return selected_symbols, selected_strategies, start_date, end_date, chart_type, show_columns, max_rows
 
+# Кэшированная загрузка данных
+@st.cache_data(ttl=30, show_spinner=False)
+def _folder_counts(folder: str) -> tuple:
+    """Возвращает количество файлов с данными (JSON/JSONL) и CSV-файлов в папке за один проход по каталогу."""
+    json_count = csv_count = 0
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            name = entry.name
+            json_count += name.endswith(DATA_FILE_EXTENSIONS)
+            csv_count += name.endswith('.csv')
+    return json_count, csv_count
+
+# Максимальное количество папок, для которых хранятся исходные DataFrame
+MAX_CACHED_LOADERS = 2
+
+@st.cache_resource(max_entries=MAX_CACHED_LOADERS, show_spinner=False)
+def _cached_load(folder: str, fingerprint: tuple) -> pd.DataFrame:
+    """
+    Загружает данные папки. Файлы перечитываются только при изменении отпечатка.
+    
+    DataFrame хранится как общий ресурс без сериализации и копирования при каждом
+    обращении, поэтому его нельзя изменять на месте: фильтры и графики работают
+    с новыми объектами. Производные таблицы кэшируются через st.cache_data по filter_key.
+    Между запусками данные переживают в Parquet-кэше загрузчика (input/<папка>/.cache/).
+    """
+    return BacktestDataLoader(folder).load_all_data(folder)
+
+def _make_loader(folder: str, fingerprint: tuple) -> BacktestDataLoader:
+    """Создает загрузчик поверх закэшированного DataFrame."""
+    loader = BacktestDataLoader(folder)
+    loader.df = _cached_load(folder, fingerprint)
+    return loader
+
+@st.cache_data(show_spinner=False)
+def _cached_symbols(folder: str, fingerprint: tuple) -> tuple:
+    """Закэшированный кортеж уникальных символов."""
+    return tuple(_make_loader(folder, fingerprint).get_unique_symbols())
+
+@st.cache_data(show_spinner=False)
+def _cached_strategies(folder: str, fingerprint: tuple) -> tuple:
+    """Закэшированный кортеж уникальных стратегий."""
+    return tuple(_make_loader(folder, fingerprint).get_unique_strategies())
+
+@st.cache_data(show_spinner=False)
+def _cached_date_range(folder: str, fingerprint: tuple) -> tuple:
+    """Закэшированный диапазон дат."""
+    return _make_loader(folder, fingerprint).get_date_range()
+
+# Кэшированная фильтрация и метрики.
+# filter_key = (папка, отпечаток, символы, стратегии, начальная дата, конечная дата);
+# символы и стратегии передаются кортежами, чтобы ключ был хэшируемым.
+# Максимальное количество отфильтрованных DataFrame, хранящихся одновременно.
+# Производные результаты (метрики, графики, CSV) кэшируются на столько же наборов фильтров
+MAX_CACHED_FILTERS = 8
+
+# Графиков на один набор фильтров: выбираемые в CHART_HANDLERS и три постоянных
+# (сравнение стратегий, процент прибыльных, время удержания)
+MAX_CACHED_FIGURES = MAX_CACHED_FILTERS * (len(CHART_HANDLERS) + 3)
+
+@st.cache_resource(max_entries=MAX_CACHED_FILTERS, show_spinner=False)
+def _cached_filter(filter_key: tuple) -> pd.DataFrame:
+    """
+    Закэшированный результат фильтрации данных.
+    
+    Все графики получают один и тот же объект DataFrame (без копии на каждый вызов),
+    поэтому визуализатор сортирует его один раз. Результат не изменяется на месте.
+    """
+    folder, fingerprint, symbols, strategies, start_date, end_date = filter_key
+    return _make_loader(folder, fingerprint).filter_data(list(symbols), list(strategies), start_date, end_date)
+
+@st.cache_data(max_entries=MAX_CACHED_FILTERS, show_spinner=False)
+def _cached_overall_metrics(filter_key: tuple) -> dict:
+    """Закэшированные общие метрики для отфильтрованных данных."""
+    return _make_loader(*filter_key[:2]).get_overall_metrics(_cached_filter(filter_key))
+
+@st.cache_data(max_entries=MAX_CACHED_FILTERS, show_spinner=False)
+def _cached_strategy_metrics(filter_key: tuple) -> pd.DataFrame:
+    """Закэшированные метрики по стратегиям для отфильтрованных данных."""
+    return _make_loader(*filter_key[:2]).get_strategy_metrics(_cached_filter(filter_key))
+
+@st.cache_data(max_entries=MAX_CACHED_FILTERS, show_spinner=False)
+def _cached_symbol_metrics(filter_key: tuple) -> pd.DataFrame:
+    """Закэшированные метрики по символам для отфильтрованных данных."""
+    return _make_loader(*filter_key[:2]).get_symbol_metrics(_cached_filter(filter_key))
+
+@st.cache_data(max_entries=MAX_CACHED_FIGURES, show_spinner=False)
+def _cached_figure(_visualizer: BacktestVisualizer, filter_key: tuple, plot_name: str, title: str = None) -> go.Figure:
+    """
+    Закэшированный график BacktestVisualizer.<plot_name> для отфильтрованных данных.
+    
+    Ключ кэша — фильтры, имя метода и заголовок, поэтому DataFrame не хэшируется.
+    """
+    plot = getattr(_visualizer, plot_name)
+    filtered = _cached_filter(filter_key)
+    return plot(filtered) if title is None else plot(filtered, title)
+
+@st.cache_data(max_entries=MAX_CACHED_FILTERS, show_spinner=False)
+def _cached_strategy_metrics_figure(filter_key: tuple) -> go.Figure:
+    """Закэшированная панель из четырех графиков метрик по стратегиям."""
+    strategy_metrics = _cached_strategy_metrics(filter_key)
+    
+    fig = make_subplots(
+        rows=2, cols=2,
+        subplot_titles=('Общий PNL по стратегиям', 'Профит-фактор по стратегиям', 
+                      'Математическое ожидание по стратегиям', 'Процент прибыльных сделок'),
+        vertical_spacing=0.15
+    )
+    
+    # Общий PNL
+    fig.add_trace(go.Bar(
+        x=strategy_metrics['strategy_name'],
+        y=strategy_metrics['total_pnl'],
+        name='Общий PNL',
+        marker_color='lightblue'
+    ), row=1, col=1)
+    
+    # Профит-фактор
+    fig.add_trace(go.Bar(
+        x=strategy_metrics['strategy_name'],
+        y=strategy_metrics['profit_factor'],
+        name='Профит-фактор',
+        marker_color='lightgreen'
+    ), row=1, col=2)
+    
+    # Математическое ожидание
+    fig.add_trace(go.Bar(
+        x=strategy_metrics['strategy_name'],
+        y=strategy_metrics['expected_value'],
+        name='Мат. ожидание',
+        marker_color='lightcoral'
+    ), row=2, col=1)
+    
+    # Процент прибыльных
+    fig.add_trace(go.Bar(
+        x=strategy_metrics['strategy_name'],
+        y=strategy_metrics['win_rate'],
+        name='Процент прибыльных',
+        marker_color='lightyellow'
+    ), row=2, col=2)
+    
+    fig.update_layout(
+        title="Сравнительный анализ стратегий",
+        height=600,
+        showlegend=False
+    )
+    
+    return fig
+
+@st.cache_data(max_entries=MAX_CACHED_FILTERS, show_spinner=False)
+def _cached_csv_bytes(_display_df: pd.DataFrame, filter_key: tuple, show_columns: tuple, max_rows: int) -> bytes:
+    """
+    Сериализует таблицу в CSV и кэширует результат между перезапусками скрипта.
+    
+    Ключ кэша — фильтры, колонки и число строк; сам DataFrame не хэшируется.
+    Формат совпадает с DataFrame.to_csv(index=False) при любом наборе колонок.
+    """
+    return _display_df.to_csv(index=False).encode('utf-8')
+
 # Инициализация компонентов
-@st.cache_resource
-def initialize_components(data_folder: str):
-    """Инициализирует компоненты приложения."""
-    loader = BacktestDataLoader(data_folder)
-    visualizer = BacktestVisualizer()
-    return loader, visualizer
+def initialize_components():
+    """
+    Инициализирует компоненты приложения.
+    
+    В st.session_state хранится только визуализатор. Данные папок живут в _cached_load
+    (не больше MAX_CACHED_LOADERS), а загрузчики создаются поверх них через _make_loader.
+    """
+    if '_visualizer' not in st.session_state:
+        st.session_state['_visualizer'] = BacktestVisualizer()
+    return st.session_state['_visualizer']
 
 # Получаем доступные папки с данными
 available_folders = get_available_data_folders()
@@ -156,13 +351,12 @@ selected_folder = st.sidebar.selectbox(
 
 # Показываем информацию о выбранной папке
 folder_path = os.path.join("input", selected_folder)
-json_files = [f for f in os.listdir(folder_path) if f.endswith('.json')]
-csv_files = [f for f in os.listdir(folder_path) if f.endswith('.csv')]
+json_count, csv_count = _folder_counts(folder_path)
 
 st.sidebar.info(f"""
 **Выбранная папка:** `{selected_folder}`  
-**JSON файлов:** {len(json_files)}  
-**CSV файлов:** {len(csv_files)}
+**JSON файлов:** {json_count}  
+**CSV файлов:** {csv_count}
 """)
 
 # Опции для работы с настройками
@@ -182,24 +376,19 @@ with col_reset1:
 with col_reset2:
     if st.button("💾 Сохранить", help="Сохранить текущие настройки как настройки по умолчанию"):
         # Получаем текущие настройки из session state
-        current_symbols = st.session_state.get('imported_symbols', symbols[:5] if len(symbols) > 5 else symbols)
-        current_strategies = st.session_state.get('imported_strategies', strategies[:3] if len(strategies) > 3 else strategies)
         current_start_date = st.session_state.get('imported_start_date', min_date.date() if min_date else None)
         current_end_date = st.session_state.get('imported_end_date', max_date.date() if max_date else None)
-        current_chart_type = st.session_state.get('imported_chart_type', "PNL по сделкам")
-        current_show_columns = st.session_state.get('imported_show_columns', ['symbol', 'strategy_name', 'type', 'entry_price', 'exit_price', 'PNL', 'PNL_percentage', 'holding_period', 'opened_at'])
-        current_max_rows = st.session_state.get('imported_max_rows', 100)
         
-        success, message = save_default_settings(
-            current_symbols,
-            current_strategies,
-            current_start_date,
-            current_end_date,
-            current_chart_type,
-            current_show_columns,
-            current_max_rows,
-            selected_folder
-        )
+        success, message = save_default_settings({
+            "data_folder": selected_folder,
+            "selected_symbols": st.session_state.get('imported_symbols', symbols[:5] if len(symbols) > 5 else symbols),
+            "selected_strategies": st.session_state.get('imported_strategies', strategies[:3] if len(strategies) > 3 else strategies),
+            "start_date": current_start_date.isoformat() if current_start_date else None,
+            "end_date": current_end_date.isoformat() if current_end_date else None,
+            "chart_type": st.session_state.get('imported_chart_type', "PNL по сделкам"),
+            "show_columns": st.session_state.get('imported_show_columns', ['symbol', 'strategy_name', 'type', 'entry_price', 'exit_price', 'PNL', 'PNL_percentage', 'holding_period', 'opened_at']),
+            "max_rows": st.session_state.get('imported_max_rows', 100)
+        })
         
         if success:
             st.success(message)
@@ -208,13 +397,24 @@ with col_reset2:
 
 st.sidebar.markdown("---")
 
-# Инициализируем компоненты с выбранной папкой
+# Инициализируем компоненты и путь к выбранной папке
 data_folder_path = os.path.join("input", selected_folder)
-loader, visualizer = initialize_components(data_folder_path)
+visualizer = initialize_components()
+data_fingerprint = folder_fingerprint(data_folder_path)
 
 # Добавляем информацию о выбранной папке в основной контент
 st.subheader(f"📁 Анализ данных: `{selected_folder}`")
 
+# Проверяем наличие данных
+try:
+    df = _cached_load(data_folder_path, data_fingerprint)
+    if df.empty:
+        st.error("❌ Не найдено данных для анализа!")
+        st.stop()
+except Exception as e:
+    st.error(f"❌ Ошибка при загрузке данных: {str(e)}")
+    st.stop()
+
 # Функция для загрузки настроек по умолчанию
 def load_default_settings():
     """Загружает настройки по умолчанию из example_settings.json если они еще не загружены."""
@@ -222,8 +422,8 @@ def load_default_settings():
     current_folder_key = f'imported_symbols_{selected_folder}'
     if not any(key in st.session_state for key in [current_folder_key, 'imported_symbols', 'imported_strategies', 'imported_start_date', 'imported_end_date']):
         try:
-            with open('example_settings.json', 'r', encoding='utf-8') as f:
-                default_settings = json.load(f)
+            with open('example_settings.json', 'rb') as f:
+                default_settings = _settings_loads(f.read())
             
             # Проверяем, есть ли сохраненная папка в настройках
             saved_data_folder = default_settings.get('data_folder')
@@ -231,9 +431,9 @@ def load_default_settings():
                 st.info(f"📁 В настройках по умолчанию сохранена папка '{saved_data_folder}', но выбрана '{selected_folder}'. Настройки будут применены с учетом текущей папки.")
             
             # Применяем настройки по умолчанию
-            symbols = loader.get_unique_symbols()
-            strategies = loader.get_unique_strategies()
-            min_date, max_date = loader.get_date_range()
+            symbols = _cached_symbols(data_folder_path, data_fingerprint)
+            strategies = _cached_strategies(data_folder_path, data_fingerprint)
+            min_date, max_date = _cached_date_range(data_folder_path, data_fingerprint)
             
             new_symbols, new_strategies, new_start_date, new_end_date, new_chart_type, new_show_columns, new_max_rows = apply_settings(
                 default_settings, symbols, strategies, min_date, max_date
@@ -261,29 +461,20 @@ def load_default_settings():
 # Загружаем настройки по умолчанию
 load_default_settings()
 
-# Проверяем наличие данных
-try:
-    df = loader.load_all_data(data_folder_path)
-    if df.empty:
-        st.error("❌ Не найдено данных для анализа!")
-        st.stop()
-except Exception as e:
-    st.error(f"❌ Ошибка при загрузке данных: {str(e)}")
-    st.stop()
-
 # Боковая панель с фильтрами
 st.sidebar.header("🔍 Фильтры")
 
 # Получаем уникальные значения
-symbols = loader.get_unique_symbols()
-strategies = loader.get_unique_strategies()
-min_date, max_date = loader.get_date_range()
+symbols = _cached_symbols(data_folder_path, data_fingerprint)
+strategies = _cached_strategies(data_folder_path, data_fingerprint)
+min_date, max_date = _cached_date_range(data_folder_path, data_fingerprint)
 
 # Фильтр по символам
 # Проверяем, есть ли импортированные настройки
 imported_symbols = st.session_state.get('imported_symbols', [])
 # Фильтруем импортированные символы, оставляя только те, что есть в текущих данных
-valid_imported_symbols = [s for s in imported_symbols if s in symbols]
+symbol_set = set(symbols)
+valid_imported_symbols = [s for s in imported_symbols if s in symbol_set]
 default_symbols = valid_imported_symbols if valid_imported_symbols else (symbols[:5] if len(symbols) > 5 else symbols)
 
 selected_symbols = st.sidebar.multiselect(
@@ -297,7 +488,8 @@ selected_symbols = st.sidebar.multiselect(
 # Проверяем, есть ли импортированные настройки
 imported_strategies = st.session_state.get('imported_strategies', [])
 # Фильтруем импортированные стратегии, оставляя только те, что есть в текущих данных
-valid_imported_strategies = [s for s in imported_strategies if s in strategies]
+strategy_set = set(strategies)
+valid_imported_strategies = [s for s in imported_strategies if s in strategy_set]
 default_strategies = valid_imported_strategies if valid_imported_strategies else (strategies[:3] if len(strategies) > 3 else strategies)
 
 selected_strategies = st.sidebar.multiselect(
@@ -394,13 +586,20 @@ else:
     start_date = None
     end_date = None
 
+# Даты в формате YYYY-MM-DD вычисляются один раз и используются ниже
+start_str = start_date.isoformat() if start_date else None
+end_str = end_date.isoformat() if end_date else None
+
 # Применяем фильтры
-filtered_df = loader.filter_data(
-    selected_symbols, 
-    selected_strategies, 
-    start_date.strftime('%Y-%m-%d') if start_date else None,
-    end_date.strftime('%Y-%m-%d') if end_date else None
+filter_key = (
+    data_folder_path,
+    data_fingerprint,
+    tuple(selected_symbols),
+    tuple(selected_strategies),
+    start_str,
+    end_str
 )
+filtered_df = _cached_filter(filter_key)
 
 if filtered_df.empty:
     st.warning("⚠️ Нет данных, соответствующих выбранным фильтрам!")
@@ -409,38 +608,33 @@ if filtered_df.empty:
 # Основной контент
 # Показываем выбранный период
 if start_date and end_date:
-    st.info(f"📅 Анализируемый период: {start_date.strftime('%Y-%m-%d')} - {end_date.strftime('%Y-%m-%d')}")
+    st.info(f"📅 Анализируемый период: {start_str} - {end_str}")
 
 # Получаем общие метрики
-overall_metrics = loader.get_overall_metrics(filtered_df)
-
-# Отображаем ключевые метрики
-col1, col2, col3, col4, col5, col6 = st.columns(6)
-
-with col1:
-    st.metric("Всего сделок", f"{overall_metrics['total_trades']:,}")
-with col2:
-    st.metric("Общий PNL", f"{overall_metrics['total_pnl']:.2f} USDT", delta=f"{overall_metrics['total_pnl']:.2f}")
-with col3:
-    st.metric("Процент прибыльных", f"{overall_metrics['win_rate']:.1f}%")
-with col4:
-    st.metric("Профит-фактор", f"{overall_metrics['profit_factor']:.2f}")
-with col5:
-    st.metric("Мат. ожидание", f"{overall_metrics['expected_value']:.4f} USDT")
-with col6:
-    st.metric("Коэф. Шарпа", f"{overall_metrics['sharpe_ratio']:.4f}")
-
-# Дополнительные метрики в отдельной строке
-col1, col2, col3, col4 = st.columns(4)
-
-with col1:
-    st.metric("Средний PNL", f"{overall_metrics['avg_pnl']:.4f} USDT")
-with col2:
-    st.metric("Медианный PNL", f"{overall_metrics['median_pnl']:.4f} USDT")
-with col3:
-    st.metric("Макс. прибыль", f"{overall_metrics['max_profit']:.2f} USDT")
-with col4:
-    st.metric("Макс. убыток", f"{overall_metrics['max_loss']:.2f} USDT")
+overall_metrics = _cached_overall_metrics(filter_key)
+
+# Отображаем ключевые метрики: (название, значение, изменение)
+m = overall_metrics
+total_pnl_str = f"{m['total_pnl']:.2f}"
+metric_specs = [
+    ("Всего сделок", f"{m['total_trades']:,}", None),
+    ("Общий PNL", f"{total_pnl_str} USDT", total_pnl_str),
+    ("Процент прибыльных", f"{m['win_rate']:.1f}%", None),
+    ("Профит-фактор", f"{m['profit_factor']:.2f}", None),
+    ("Мат. ожидание", f"{m['expected_value']:.4f} USDT", None),
+    ("Коэф. Шарпа", f"{m['sharpe_ratio']:.4f}", None),
+    # Дополнительные метрики в отдельной строке
+    ("Средний PNL", f"{m['avg_pnl']:.4f} USDT", None),
+    ("Медианный PNL", f"{m['median_pnl']:.4f} USDT", None),
+    ("Макс. прибыль", f"{m['max_profit']:.2f} USDT", None),
+    ("Макс. убыток", f"{m['max_loss']:.2f} USDT", None),
+]
+
+for col, (label, value, delta) in zip(st.columns(6), metric_specs[:6]):
+    col.metric(label, value, delta=delta)
+
+for col, (label, value, delta) in zip(st.columns(4), metric_specs[6:]):
+    col.metric(label, value, delta=delta)
 
 st.markdown("---")
 
@@ -452,28 +646,16 @@ with tab1:
     
     # Выбор типа графика
     # Проверяем, есть ли импортированные настройки
-    default_chart_type = st.session_state.get('imported_chart_type', "PNL по сделкам")
+    default_chart_type = st.session_state.get('imported_chart_type', CHART_TYPES[0])
     chart_type = st.selectbox(
         "Выберите тип графика:",
-        ["PNL по сделкам", "Накопленный PNL", "PNL по времени", "Распределение PNL"],
-        index=["PNL по сделкам", "Накопленный PNL", "PNL по времени", "Распределение PNL"].index(default_chart_type) if default_chart_type in ["PNL по сделкам", "Накопленный PNL", "PNL по времени", "Распределение PNL"] else 0
+        CHART_TYPES,
+        index=CHART_INDEX.get(default_chart_type, 0)
     )
     
-    if chart_type == "PNL по сделкам":
-        fig = visualizer.plot_pnl_by_trades(filtered_df, f"PNL по сделкам - {', '.join(selected_symbols)}")
-        st.plotly_chart(fig, width='stretch')
-    
-    elif chart_type == "Накопленный PNL":
-        fig = visualizer.plot_cumulative_pnl(filtered_df, f"Накопленный PNL - {', '.join(selected_symbols)}")
-        st.plotly_chart(fig, width='stretch')
-    
-    elif chart_type == "PNL по времени":
-        fig = visualizer.plot_pnl_timeline(filtered_df, f"PNL по времени - {', '.join(selected_symbols)}")
-        st.plotly_chart(fig, width='stretch')
-    
-    elif chart_type == "Распределение PNL":
-        fig = visualizer.plot_pnl_distribution(filtered_df, f"Распределение PNL по стратегиям")
-        st.plotly_chart(fig, width='stretch')
+    plot_name, title_template = CHART_HANDLERS[chart_type]
+    fig = _cached_figure(visualizer, filter_key, plot_name, title_template.format(symbols=', '.join(selected_symbols)))
+    st.plotly_chart(fig, width='stretch')
 
 with tab2:
     st.header("Анализ стратегий")
@@ -482,17 +664,17 @@ with tab2:
     
     with col1:
         # Сравнительный анализ стратегий
-        fig = visualizer.plot_strategy_comparison(filtered_df)
+        fig = _cached_figure(visualizer, filter_key, "plot_strategy_comparison")
         st.plotly_chart(fig, width='stretch')
     
     with col2:
         # Процент прибыльных сделок
-        fig = visualizer.plot_win_rate_by_strategy(filtered_df)
+        fig = _cached_figure(visualizer, filter_key, "plot_win_rate_by_strategy")
         st.plotly_chart(fig, width='stretch')
     
     # Распределение времени удержания
     st.subheader("Распределение времени удержания")
-    fig = visualizer.plot_holding_period_distribution(filtered_df)
+    fig = _cached_figure(visualizer, filter_key, "plot_holding_period_distribution")
     st.plotly_chart(fig, use_container_width=True)
 
 with tab3:
@@ -500,12 +682,19 @@ with tab3:
     
     # Метрики по стратегиям
     st.subheader("Метрики по стратегиям")
-    strategy_metrics = loader.get_strategy_metrics(filtered_df)
+    strategy_metrics = _cached_strategy_metrics(filter_key)
     
     if not strategy_metrics.empty:
         # Отображаем ключевые метрики
-        display_metrics = strategy_metrics[['strategy_name', 'total_pnl', 'avg_pnl', 'win_rate', 'trades_count', 'profit_factor', 'expected_value']].copy()
-        display_metrics.columns = ['Стратегия', 'Общий PNL', 'Средний PNL', 'Процент прибыльных', 'Количество сделок', 'Профит-фактор', 'Мат. ожидание']
+        display_metrics = strategy_metrics[['strategy_name', 'total_pnl', 'avg_pnl', 'win_rate', 'trades_count', 'profit_factor', 'expected_value']].rename(columns={
+            'strategy_name': 'Стратегия',
+            'total_pnl': 'Общий PNL',
+            'avg_pnl': 'Средний PNL',
+            'win_rate': 'Процент прибыльных',
+            'trades_count': 'Количество сделок',
+            'profit_factor': 'Профит-фактор',
+            'expected_value': 'Мат. ожидание'
+        })
         
         st.dataframe(
             display_metrics,
@@ -514,60 +703,23 @@ with tab3:
         )
         
         # График метрик
-        fig = make_subplots(
-            rows=2, cols=2,
-            subplot_titles=('Общий PNL по стратегиям', 'Профит-фактор по стратегиям', 
-                          'Математическое ожидание по стратегиям', 'Процент прибыльных сделок'),
-            vertical_spacing=0.15
-        )
-        
-        # Общий PNL
-        fig.add_trace(go.Bar(
-            x=strategy_metrics['strategy_name'],
-            y=strategy_metrics['total_pnl'],
-            name='Общий PNL',
-            marker_color='lightblue'
-        ), row=1, col=1)
-        
-        # Профит-фактор
-        fig.add_trace(go.Bar(
-            x=strategy_metrics['strategy_name'],
-            y=strategy_metrics['profit_factor'],
-            name='Профит-фактор',
-            marker_color='lightgreen'
-        ), row=1, col=2)
-        
-        # Математическое ожидание
-        fig.add_trace(go.Bar(
-            x=strategy_metrics['strategy_name'],
-            y=strategy_metrics['expected_value'],
-            name='Мат. ожидание',
-            marker_color='lightcoral'
-        ), row=2, col=1)
-        
-        # Процент прибыльных
-        fig.add_trace(go.Bar(
-            x=strategy_metrics['strategy_name'],
-            y=strategy_metrics['win_rate'],
-            name='Процент прибыльных',
-            marker_color='lightyellow'
-        ), row=2, col=2)
-        
-        fig.update_layout(
-            title="Сравнительный анализ стратегий",
-            height=600,
-            showlegend=False
-        )
-        
+        fig = _cached_strategy_metrics_figure(filter_key)
         st.plotly_chart(fig, width='stretch')
     
     # Метрики по символам
     st.subheader("Метрики по символам")
-    symbol_metrics = loader.get_symbol_metrics(filtered_df)
+    symbol_metrics = _cached_symbol_metrics(filter_key)
     
     if not symbol_metrics.empty:
-        display_symbol_metrics = symbol_metrics[['symbol', 'total_pnl', 'avg_pnl', 'win_rate', 'trades_count', 'profit_factor', 'expected_value']].copy()
-        display_symbol_metrics.columns = ['Символ', 'Общий PNL', 'Средний PNL', 'Процент прибыльных', 'Количество сделок', 'Профит-фактор', 'Мат. ожидание']
+        display_symbol_metrics = symbol_metrics[['symbol', 'total_pnl', 'avg_pnl', 'win_rate', 'trades_count', 'profit_factor', 'expected_value']].rename(columns={
+            'symbol': 'Символ',
+            'total_pnl': 'Общий PNL',
+            'avg_pnl': 'Средний PNL',
+            'win_rate': 'Процент прибыльных',
+            'trades_count': 'Количество сделок',
+            'profit_factor': 'Профит-фактор',
+            'expected_value': 'Мат. ожидание'
+        })
         
         st.dataframe(
             display_symbol_metrics,
@@ -597,17 +749,25 @@ with tab4:
     
     # Отображаем таблицу
     if show_columns:
-        display_df = filtered_df[show_columns].head(max_rows)
+        # Сначала берем первые max_rows строк, затем колонки: проекция не затрагивает весь DataFrame
+        display_df = filtered_df.iloc[:max_rows][show_columns].copy()
         
         # Форматируем числовые колонки
         numeric_columns = ['entry_price', 'exit_price', 'PNL', 'PNL_percentage', 'holding_period']
         for col in numeric_columns:
             if col in display_df.columns:
                 if col in ['entry_price', 'exit_price']:
-                    # Для цен показываем больше знаков после запятой для маленьких чисел
-                    display_df[col] = display_df[col].apply(lambda x: f"{x:.8f}" if abs(x) < 0.001 else f"{x:.6f}")
+                    # Для цен показываем больше знаков после запятой для маленьких чисел:
+                    # форматируем все значения один раз, а 8 знаков — только для маленьких цен
+                    prices = display_df[col].to_numpy()
+                    formatted = np.array(list(map('{:.6f}'.format, prices.tolist())), dtype=object)
+                    small = np.abs(prices) < 0.001
+                    if small.any():
+                        formatted[small] = list(map('{:.8f}'.format, prices[small].tolist()))
+                    display_df[col] = formatted
                 else:
-                    display_df[col] = display_df[col].round(4)
+                    # float64, как до перевода колонок в float32/int32: таблица и CSV выводят те же числа
+                    display_df[col] = display_df[col].astype('float64').round(4)
         
         st.dataframe(
             display_df,
@@ -616,7 +776,7 @@ with tab4:
         )
         
         # Скачивание данных
-        csv = display_df.to_csv(index=False)
+        csv = _cached_csv_bytes(display_df, filter_key, tuple(show_columns), max_rows)
         st.download_button(
             label="📥 Скачать данные как CSV",
             data=csv,
@@ -639,24 +799,15 @@ with tab5:
             "data_folder": selected_folder,
             "selected_symbols": selected_symbols,
             "selected_strategies": selected_strategies,
-            "start_date": start_date.strftime('%Y-%m-%d') if start_date else None,
-            "end_date": end_date.strftime('%Y-%m-%d') if end_date else None,
+            "start_date": start_str,
+            "end_date": end_str,
             "chart_type": chart_type if 'chart_type' in locals() else "PNL по сделкам",
             "show_columns": show_columns if 'show_columns' in locals() else ['symbol', 'strategy_name', 'type', 'entry_price', 'exit_price', 'PNL', 'PNL_percentage', 'holding_period', 'opened_at'],
             "max_rows": max_rows if 'max_rows' in locals() else 100
         }
         
         # Создаем JSON для экспорта
-        settings_json = export_settings(
-            current_settings["selected_symbols"],
-            current_settings["selected_strategies"],
-            start_date,
-            end_date,
-            current_settings["chart_type"],
-            current_settings["show_columns"],
-            current_settings["max_rows"],
-            current_settings["data_folder"]
-        )
+        settings_json = export_settings(current_settings)
         
         # Кнопка скачивания
         st.download_button(
@@ -675,16 +826,7 @@ with tab5:
         
         with col_save1:
             if st.button("🎯 Сохранить как настройки по умолчанию", type="primary", help="Перезаписывает example_settings.json текущими настройками"):
-                success, message = save_default_settings(
-                    current_settings["selected_symbols"],
-                    current_settings["selected_strategies"],
-                    start_date,
-                    end_date,
-                    current_settings["chart_type"],
-                    current_settings["show_columns"],
-                    current_settings["max_rows"],
-                    current_settings["data_folder"]
-                )
+                success, message = save_default_settings(current_settings)
                 
                 if success:
                     st.success(message)
@@ -695,8 +837,8 @@ with tab5:
         with col_save2:
             if st.button("📋 Показать текущие настройки по умолчанию", help="Показывает содержимое example_settings.json"):
                 try:
-                    with open('example_settings.json', 'r', encoding='utf-8') as f:
-                        default_settings = json.load(f)
+                    with open('example_settings.json', 'rb') as f:
+                        default_settings = _settings_loads(f.read())
                     st.json(default_settings)
                 except FileNotFoundError:
                     st.warning("Файл example_settings.json не найден!")
@@ -763,7 +905,7 @@ with tab5:
     with col1:
         if st.button("📈 Топ-стратегии", help="Показать только лучшие стратегии"):
             # Находим топ-3 стратегии по PNL
-            strategy_metrics = loader.get_strategy_metrics(filtered_df)
+            strategy_metrics = _cached_strategy_metrics(filter_key)
             top_strategies = strategy_metrics.nlargest(3, 'total_pnl')['strategy_name'].tolist()
             st.session_state.imported_strategies = top_strategies
             st.session_state.imported_symbols = selected_symbols  # Оставляем текущие символы
@@ -773,7 +915,7 @@ with tab5:
     with col2:
         if st.button("💰 Топ-монеты", help="Показать только лучшие монеты"):
             # Находим топ-5 монет по PNL
-            symbol_metrics = loader.get_symbol_metrics(filtered_df)
+            symbol_metrics = _cached_symbol_metrics(filter_key)
             top_symbols = symbol_metrics.nlargest(5, 'total_pnl')['symbol'].tolist()
             st.session_state.imported_symbols = top_symbols
             st.session_state.imported_strategies = selected_strategies  # Оставляем текущие стратегии
@@ -792,8 +934,8 @@ with tab5:
     with col4:
         if st.button("🎯 Настройки по умолчанию", help="Загрузить example_settings.json"):
             try:
-                with open('example_settings.json', 'r', encoding='utf-8') as f:
-                    default_settings = json.load(f)
+                with open('example_settings.json', 'rb') as f:
+                    default_settings = _settings_loads(f.read())
                 
                 new_symbols, new_strategies, new_start_date, new_end_date, new_chart_type, new_show_columns, new_max_rows = apply_settings(
                     default_settings, symbols, strategies, min_date, max_date
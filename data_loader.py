@@ -4,10 +4,338 @@
 
 import json
 import pandas as pd
+import numpy as np
 import os
+import sys
+import mmap
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from typing import List, Dict, Any
 from datetime import datetime
-import streamlit as st
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Межпроцессная блокировка сборки кэша: fcntl на Unix, msvcrt на Windows
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+# Колонки сделки в порядке их следования в JSON-файлах бэктестов
+TRADE_COLUMNS = [
+    'id', 'strategy_name', 'symbol', 'exchange', 'type',
+    'entry_price', 'exit_price', 'qty', 'fee', 'size',
+    'PNL', 'PNL_percentage', 'holding_period', 'opened_at', 'closed_at',
+    'file_name', 'considering_timeframes'
+]
+
+# Строковые колонки с небольшим числом уникальных значений
+CATEGORY_COLUMNS = ('symbol', 'strategy_name', 'type', 'file_name')
+
+# Строковые колонки с уникальными значениями: хранятся как строки pyarrow, а не объекты Python
+STRING_COLUMNS = ('id', 'exchange')
+
+# Колонки, для которых достаточно точности float32
+FLOAT32_COLUMNS = {'PNL': 'float32', 'PNL_percentage': 'float32', 'fee': 'float32'}
+
+# Расширения файлов с данными: JSON-объект с массивом trades или JSON Lines (сделка на строку)
+DATA_FILE_EXTENSIONS = ('.json', '.jsonl')
+
+# Подпапка с Parquet-кэшем загруженных данных внутри папки бэктестов
+PARQUET_CACHE_DIR = '.cache'
+
+# Версия формата кэша: увеличивается при изменении схемы или порядка строк DataFrame
+PARQUET_CACHE_VERSION = 3
+
+# Именованные агрегации для метрик по стратегиям и символам (имя колонки -> (исходная колонка, функция))
+GROUP_METRIC_AGGS = {
+    'total_pnl': ('PNL', 'sum'),
+    'avg_pnl': ('PNL', 'mean'),
+    'median_pnl': ('PNL', 'median'),
+    'std_pnl': ('PNL', 'std'),
+    'trades_count': ('PNL', 'count'),
+    'avg_pnl_pct': ('PNL_percentage', 'mean'),
+    'median_pnl_pct': ('PNL_percentage', 'median'),
+    'std_pnl_pct': ('PNL_percentage', 'std'),
+    'avg_holding_hours': ('holding_period', 'mean'),
+    'median_holding_hours': ('holding_period', 'median'),
+    'total_fees': ('fee', 'sum'),
+    'avg_fee': ('fee', 'mean'),
+    'median_fee': ('fee', 'median'),
+    'profitable_trades': ('is_profitable', 'sum'),
+}
+
+
+def _notify(level: str, message: str):
+    """
+    Выводит сообщение через Streamlit, если модуль работает внутри приложения, иначе в консоль.
+    
+    Streamlit не импортируется здесь сам: загрузчик используется и из CLI (demo.py),
+    где запуск его runtime только замедлил бы старт.
+    
+    Args:
+        level: Метод Streamlit для вывода ('warning' или 'error')
+        message: Текст сообщения
+    """
+    st = sys.modules.get('streamlit')
+    if st is not None:
+        getattr(st, level)(message)
+    else:
+        print(message)
+
+
+def _load_one(file_path: str) -> tuple:
+    """
+    Загружает сделки из одного JSON-файла.
+    
+    Каждая сделка дополняется именем файла и списком таймфреймов. Ошибка
+    не пробрасывается, а возвращается, чтобы сообщение о ней было выведено
+    из основного потока.
+    
+    Args:
+        file_path: Путь к JSON-файлу
+        
+    Returns:
+        tuple: (список сделок, None) при успехе или ([], исключение) при ошибке
+    """
+    file_name = os.path.basename(file_path)
+    try:
+        with open(file_path, 'rb') as f:
+            if orjson is not None and os.fstat(f.fileno()).st_size > 0:
+                # orjson разбирает файл прямо из страничного кэша ОС, без копии в bytes
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                    data = orjson.loads(view)
+            else:
+                # Пустые файлы не отображаются в память; stdlib json принимает только bytes/str
+                raw = f.read()
+                data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+        
+        timeframes = data.get('considering_timeframes', [])
+        trades = data.get('trades', [])
+        for trade in trades:
+            trade['file_name'] = file_name
+            trade['considering_timeframes'] = timeframes
+        return trades, None
+    except Exception as e:
+        return [], e
+
+
+def _load_one_jsonl(file_path: str) -> tuple:
+    """
+    Загружает сделки из одного JSONL-файла (одна сделка на строку).
+    
+    Файл разбирается C++-парсером pyarrow сразу в DataFrame, минуя словари Python.
+    Таймфреймы, если нужны, хранятся в каждой строке в поле considering_timeframes.
+    
+    Args:
+        file_path: Путь к JSONL-файлу
+        
+    Returns:
+        tuple: (DataFrame сделок, None) при успехе или (None, исключение) при ошибке
+    """
+    try:
+        frame = pd.read_json(file_path, lines=True, engine='pyarrow')
+        frame['file_name'] = os.path.basename(file_path)
+        return frame.reindex(columns=TRADE_COLUMNS), None
+    except Exception as e:
+        return None, e
+
+
+def _load_file(file_path: str) -> tuple:
+    """Загружает файл с данными подходящим парсером в зависимости от расширения."""
+    if file_path.endswith('.jsonl'):
+        return _load_one_jsonl(file_path)
+    return _load_one(file_path)
+
+
+def _isin_mask(column: pd.Series, values: List[str]) -> np.ndarray:
+    """
+    Возвращает булеву маску вхождения значений колонки в список.
+    
+    Для категориальной колонки сравниваются целочисленные коды категорий,
+    без сравнения строк по каждой строке.
+    
+    Args:
+        column: Колонка DataFrame
+        values: Допустимые значения
+        
+    Returns:
+        np.ndarray: Маска длины колонки
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes = column.cat.categories.get_indexer(list(values))
+        return np.isin(column.cat.codes.to_numpy(), codes[codes >= 0])
+    return column.isin(values).to_numpy()
+
+
+def _sorted_uniques(column: pd.Series) -> List[str]:
+    """
+    Возвращает отсортированный список уникальных значений колонки.
+    
+    У категориальной колонки загрузчика категории уже отсортированы и все
+    используются, поэтому проход по всем строкам не нужен.
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype) and column.cat.categories.is_monotonic_increasing:
+        return column.cat.categories.tolist()
+    return sorted(column.unique().tolist())
+
+
+def _group_metrics(df: pd.DataFrame, by: str) -> pd.DataFrame:
+    """
+    Агрегирует GROUP_METRIC_AGGS по группам колонки by.
+    
+    Колонки FLOAT32_COLUMNS переводятся в float64 до агрегации, чтобы суммы в таблицах
+    совпадали с общими метриками, которые тоже накапливаются в float64.
+    """
+    sources = list(dict.fromkeys(source for source, _ in GROUP_METRIC_AGGS.values()))
+    values = df[sources].astype({column: 'float64' for column in FLOAT32_COLUMNS if column in sources})
+    return values.groupby(df[by], observed=True).agg(**GROUP_METRIC_AGGS).round(4)
+
+
+def folder_fingerprint(folder: str) -> tuple:
+    """Возвращает отпечаток папки: отсортированные пары (имя файла с данными, время изменения)."""
+    return tuple(sorted(
+        (f, os.path.getmtime(os.path.join(folder, f)))
+        for f in os.listdir(folder) if f.endswith(DATA_FILE_EXTENSIONS)
+    ))
+
+
+def _to_pyarrow_strings(df: pd.DataFrame) -> pd.DataFrame:
+    """Переводит STRING_COLUMNS в строки pyarrow; без pyarrow колонки остаются как есть."""
+    try:
+        return df.astype({col: 'string[pyarrow]' for col in STRING_COLUMNS}, copy=False)
+    except ImportError:
+        return df
+
+
+def _parquet_cache_paths(folder: str) -> tuple:
+    """Возвращает пути к Parquet-кэшу папки и файлу с его отпечатком."""
+    cache_dir = os.path.join(folder, PARQUET_CACHE_DIR)
+    return os.path.join(cache_dir, 'all.parquet'), os.path.join(cache_dir, '_fingerprint.json')
+
+
+def _replace_atomically(path: str, write):
+    """
+    Записывает файл через временный файл с суффиксом процесса и потока и os.replace.
+    
+    Несколько процессов, собирающих один кэш, не перезаписывают временные файлы друг друга,
+    а читатель видит либо старый, либо полностью записанный файл.
+    """
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _lock_file(fd: int, blocking: bool) -> bool:
+    """
+    Берет исключительную блокировку открытого файла средствами ОС.
+    
+    Блокировку снимает ОС при закрытии файла или завершении процесса, поэтому
+    аварийно завершившийся сборщик не оставляет «вечной» блокировки.
+    
+    Returns:
+        bool: True, если блокировка получена; False, если файл уже заблокирован (при blocking=False)
+    """
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+    
+    # msvcrt.locking в блокирующем режиме сдается через ~10 секунд, поэтому повторяем попытки
+    while True:
+        try:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+            time.sleep(0.2)
+
+
+@contextmanager
+def _parquet_build_lock(folder: str):
+    """
+    Блокировка сборки Parquet-кэша папки между процессами (например, прогрев в run.py и сеанс Streamlit).
+    
+    На время блока with процесс держит блокировку. Возвращает True, если перед этим
+    пришлось дождаться другого сборщика: тогда кэш, скорее всего, уже готов и его
+    стоит прочитать вместо повторного разбора файлов. Без поддержки блокировок
+    в ОС или при ошибке доступа к папке кэша возвращает False без блокировки.
+    """
+    lock_path = os.path.join(folder, PARQUET_CACHE_DIR, 'all.parquet.lock')
+    fd = None
+    if fcntl is not None or msvcrt is not None:
+        try:
+            os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+            fd = os.open(lock_path, os.O_CREAT | os.O_RDWR)
+        except OSError:
+            fd = None
+    
+    if fd is None:
+        yield False
+        return
+    
+    try:
+        waited = not _lock_file(fd, blocking=False)
+        if waited:
+            _lock_file(fd, blocking=True)
+        yield waited
+    finally:
+        # Закрытие дескриптора снимает блокировку; сам файл остается для следующих сборок
+        os.close(fd)
+
+
+def _read_parquet_cache(folder: str, fingerprint: tuple):
+    """Читает Parquet-кэш папки, если он построен для того же отпечатка; иначе None."""
+    parquet_path, fingerprint_path = _parquet_cache_paths(folder)
+    try:
+        with open(fingerprint_path, 'r', encoding='utf-8') as f:
+            cached_fingerprint = json.load(f)
+        if cached_fingerprint != {'version': PARQUET_CACHE_VERSION, 'files': [list(item) for item in fingerprint]}:
+            return None
+        # Parquet возвращает строки как string[python], поэтому восстанавливаем буфер pyarrow
+        return _to_pyarrow_strings(pd.read_parquet(parquet_path, engine='pyarrow'))
+    except Exception:
+        return None
+
+
+def _write_parquet_cache(folder: str, fingerprint: tuple, df: pd.DataFrame):
+    """Сохраняет DataFrame в Parquet-кэш папки. Ошибки записи не критичны и игнорируются."""
+    parquet_path, fingerprint_path = _parquet_cache_paths(folder)
+    try:
+        os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+        _replace_atomically(
+            parquet_path,
+            lambda path: df.to_parquet(path, engine='pyarrow', compression='zstd', index=False)
+        )
+        
+        def write_fingerprint(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'version': PARQUET_CACHE_VERSION, 'files': [list(item) for item in fingerprint]}, f)
+        
+        _replace_atomically(fingerprint_path, write_fingerprint)
+    except Exception:
+        pass
 
 
 def get_available_data_folders(input_dir: str = "input") -> List[str]:
@@ -27,14 +355,38 @@ def get_available_data_folders(input_dir: str = "input") -> List[str]:
     for item in os.listdir(input_dir):
         item_path = os.path.join(input_dir, item)
         if os.path.isdir(item_path):
-            # Проверяем, есть ли в папке JSON файлы
-            json_files = [f for f in os.listdir(item_path) if f.endswith('.json')]
+            # Проверяем, есть ли в папке JSON или JSONL файлы
+            json_files = [f for f in os.listdir(item_path) if f.endswith(DATA_FILE_EXTENSIONS)]
             if json_files:
                 folders.append(item)
     
     return sorted(folders)
 
 
+def warm_parquet_caches(input_dir: str = "input", stop_event: threading.Event = None) -> List[str]:
+    """
+    Заранее строит Parquet-кэш для всех папок с данными.
+    
+    Папки с актуальным кэшем пропускаются (load_all_data читает Parquet),
+    остальные разбираются и сохраняются. Первый сеанс приложения после
+    изменения данных читает уже готовый Parquet.
+    
+    Args:
+        input_dir: Путь к основной папке input
+        stop_event: Событие остановки; проверяется перед каждой папкой
+        
+    Returns:
+        List[str]: Названия обработанных папок
+    """
+    folders = []
+    for folder in get_available_data_folders(input_dir):
+        if stop_event is not None and stop_event.is_set():
+            break
+        BacktestDataLoader(os.path.join(input_dir, folder)).load_all_data()
+        folders.append(folder)
+    return folders
+
+
 class BacktestDataLoader:
     """Класс для загрузки и обработки данных бэктестов."""
     
@@ -48,71 +400,135 @@ class BacktestDataLoader:
         self.data_folder = data_folder
         self.df = None
         self.raw_data = []
+        # Диапазон дат и DataFrame, для которого он вычислен
+        self._date_range = None
+        self._date_range_df = None
     
-    @st.cache_data
-    def load_all_data(_self, data_folder: str) -> pd.DataFrame:
+    def load_all_data(self, data_folder: str = None, use_cache: bool = True) -> pd.DataFrame:
         """
-        Загружает все JSON-файлы из папки и объединяет в DataFrame.
+        Загружает все JSON- и JSONL-файлы из папки и объединяет в DataFrame.
+        
+        Строки упорядочены по closed_at. Собранный DataFrame сохраняется в Parquet-кэш (<папка>/.cache/all.parquet)
+        вместе с отпечатком папки. Пока JSON-файлы не менялись, повторные
+        запуски читают Parquet вместо разбора всех JSON.
+        
+        Args:
+            data_folder: Путь к папке с JSON-файлами (по умолчанию self.data_folder)
+            use_cache: Использовать ли Parquet-кэш папки
         
         Returns:
             pd.DataFrame: Объединенные данные всех сделок
         """
-        all_trades = []
+        data_folder = data_folder or self.data_folder
+        
+        if not use_cache:
+            return self._parse_folder(data_folder)
+        
+        fingerprint = folder_fingerprint(data_folder)
+        df = _read_parquet_cache(data_folder, fingerprint)
+        if df is not None:
+            return df
+        
+        # Папку разбирает только один процесс; остальные дожидаются его и читают готовый кэш
+        with _parquet_build_lock(data_folder) as waited:
+            if waited:
+                df = _read_parquet_cache(data_folder, fingerprint)
+                if df is not None:
+                    return df
+            
+            df = self._parse_folder(data_folder)
+            if not df.empty:
+                _write_parquet_cache(data_folder, fingerprint, df)
         
-        # Получаем список всех JSON-файлов
-        json_files = [f for f in os.listdir(_self.data_folder) if f.endswith('.json')]
+        return df
+    
+    def _parse_folder(self, data_folder: str) -> pd.DataFrame:
+        """
+        Разбирает все JSON- и JSONL-файлы папки в один DataFrame, упорядоченный по closed_at.
         
-        for file_name in json_files:
-            file_path = os.path.join(_self.data_folder, file_name)
+        Args:
+            data_folder: Путь к папке с файлами
             
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                # Добавляем информацию о файле к каждой сделке
-                for trade in data.get('trades', []):
-                    trade['file_name'] = file_name
-                    trade['considering_timeframes'] = data.get('considering_timeframes', [])
-                    all_trades.append(trade)
-                    
-            except Exception as e:
-                st.warning(f"Ошибка при загрузке файла {file_name}: {str(e)}")
-                continue
-        
-        if not all_trades:
-            st.error("Не найдено ни одного файла с данными!")
+        Returns:
+            pd.DataFrame: Объединенные данные всех сделок
+        """
+        # Получаем список всех JSON- и JSONL-файлов
+        json_files = [f for f in os.listdir(data_folder) if f.endswith(DATA_FILE_EXTENSIONS)]
+        
+        # Загружаем файлы параллельно: чтение с диска и разбор JSON перекрываются
+        file_paths = [os.path.join(data_folder, f) for f in json_files]
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+            results = list(executor.map(_load_file, file_paths))
+        
+        # Предупреждения выводим из основного потока, после завершения всех задач
+        for file_name, (_, error) in zip(json_files, results):
+            if error is not None:
+                _notify('warning', f"Ошибка при загрузке файла {file_name}: {str(error)}")
+        
+        # JSONL-файлы уже разобраны в DataFrame, JSON-файлы вернули списки сделок
+        jsonl_frames = [data for data, _ in results if isinstance(data, pd.DataFrame) and not data.empty]
+        all_trades = list(itertools.chain.from_iterable(
+            data for data, _ in results if isinstance(data, list)
+        ))
+        
+        if not all_trades and not jsonl_frames:
+            _notify('error', "Не найдено ни одного файла с данными!")
             return pd.DataFrame()
         
-        # Создаем DataFrame
-        df = pd.DataFrame(all_trades)
+        # Создаем DataFrame с явным списком колонок, без вывода схемы по словарям
+        frames = jsonl_frames
+        if all_trades:
+            frames = [pd.DataFrame.from_records(all_trades, columns=TRADE_COLUMNS)] + jsonl_frames
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        
+        # Понижаем точность PNL и комиссий до float32; цены и объемы остаются float64
+        df = df.astype(FLOAT32_COLUMNS, copy=False)
+        df['holding_period'] = pd.to_numeric(df['holding_period'], downcast='integer')
         
         # Конвертируем временные метки в datetime
         df['opened_at'] = pd.to_datetime(df['opened_at'], unit='ms')
         df['closed_at'] = pd.to_datetime(df['closed_at'], unit='ms')
         
         # Добавляем дополнительные колонки
-        df['duration_hours'] = df['holding_period'] / 3600  # длительность в часах
-        df['is_profitable'] = df['PNL'] > 0
+        df['duration_hours'] = (df['holding_period'].to_numpy() / 3600).astype(np.float32)  # длительность в часах
+        # int8 суммируется в groupby напрямую, без приведения bool
+        df['is_profitable'] = (df['PNL'].to_numpy() > 0).astype(np.int8)
         df['is_long'] = df['type'] == 'long'
         
+        # Повторяющиеся строки храним как category: groupby и isin работают по целочисленным кодам.
+        # Категории, выведенные astype, уже отсортированы, и списки фильтров берутся прямо из них
+        for col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype('category')
+        
+        df = _to_pyarrow_strings(df)
+        
+        # Сортируем один раз по времени закрытия: отфильтрованные срезы сохраняют порядок,
+        # и накопленному PNL и графикам не нужно сортировать заново. Файлы, выгруженные
+        # в хронологическом порядке, уже упорядочены, и для них пропускается копия всего DataFrame
+        if not df['closed_at'].is_monotonic_increasing:
+            df = df.sort_values('closed_at', kind='mergesort', ignore_index=True)
+        
         return df
     
     def get_unique_symbols(self) -> List[str]:
         """Возвращает список уникальных символов."""
         if self.df is None:
             self.df = self.load_all_data(self.data_folder)
-        return sorted(self.df['symbol'].unique().tolist())
+        return _sorted_uniques(self.df['symbol'])
     
     def get_unique_strategies(self) -> List[str]:
         """Возвращает список уникальных стратегий."""
         if self.df is None:
             self.df = self.load_all_data(self.data_folder)
-        return sorted(self.df['strategy_name'].unique().tolist())
+        return _sorted_uniques(self.df['strategy_name'])
     
     def get_date_range(self) -> tuple:
         """
         Возвращает минимальную и максимальную даты в данных.
         
+        Диапазон вычисляется один раз для текущего self.df и пересчитывается,
+        только если DataFrame заменен.
+        
         Returns:
             tuple: (min_date, max_date) в формате datetime
         """
@@ -122,10 +538,12 @@ class BacktestDataLoader:
         if self.df.empty:
             return None, None
         
-        min_date = self.df['opened_at'].min()
-        max_date = self.df['opened_at'].max()
+        if self._date_range_df is not self.df:
+            opened = self.df['opened_at']
+            self._date_range = (opened.min(), opened.max())
+            self._date_range_df = self.df
         
-        return min_date, max_date
+        return self._date_range
     
     def filter_data(self, symbols: List[str] = None, strategies: List[str] = None, 
                    start_date: str = None, end_date: str = None) -> pd.DataFrame:
@@ -144,24 +562,55 @@ class BacktestDataLoader:
         if self.df is None:
             self.df = self.load_all_data(self.data_folder)
         
-        filtered_df = self.df.copy()
+        # Копию не делаем: условия собираются в одну маску, и выборка создается один раз в конце
+        df = self.df
+        mask = np.ones(len(df), dtype=bool)
         
         if symbols:
-            filtered_df = filtered_df[filtered_df['symbol'].isin(symbols)]
+            mask &= _isin_mask(df['symbol'], symbols)
         
         if strategies:
-            filtered_df = filtered_df[filtered_df['strategy_name'].isin(strategies)]
+            mask &= _isin_mask(df['strategy_name'], strategies)
         
-        # Фильтрация по датам
-        if start_date:
-            start_datetime = pd.to_datetime(start_date)
-            filtered_df = filtered_df[filtered_df['opened_at'] >= start_datetime]
+        # Фильтрация по датам: сравниваем int64-представление datetime64 со скалярными границами
+        if start_date or end_date:
+            opened = df['opened_at'].to_numpy()
+            opened_ns = opened.view('i8')
+            
+            if start_date:
+                start_ns = pd.Timestamp(start_date).to_datetime64().astype(opened.dtype).view('i8')
+                mask &= opened_ns >= start_ns
+            
+            if end_date:
+                end_datetime = pd.Timestamp(end_date) + pd.Timedelta(days=1)  # Включаем весь день
+                end_ns = end_datetime.to_datetime64().astype(opened.dtype).view('i8')
+                mask &= opened_ns < end_ns
         
-        if end_date:
-            end_datetime = pd.to_datetime(end_date) + pd.Timedelta(days=1)  # Включаем весь день
-            filtered_df = filtered_df[filtered_df['opened_at'] < end_datetime]
+        return df.loc[mask]
+    
+    def _profit_factor_by(self, df: pd.DataFrame, by: str) -> np.ndarray:
+        """
+        Вычисляет профит-фактор по группам за один groupby.
         
-        return filtered_df
+        Args:
+            df: DataFrame для анализа
+            by: Колонка группировки ('strategy_name' или 'symbol')
+            
+        Returns:
+            np.ndarray: Профит-фактор в порядке групп groupby
+        """
+        # Группируем только обрезанные ряды PNL, без копии всего DataFrame; суммы в float64
+        pnl = df['PNL'].astype('float64')
+        keys = df[by]
+        gross_profit = pnl.clip(lower=0).groupby(keys, observed=True).sum().to_numpy()
+        gross_loss = (-pnl).clip(lower=0).groupby(keys, observed=True).sum().to_numpy()
+        
+        # Без убыточных сделок профит-фактор бесконечен (если есть прибыль) или равен 0
+        profit_factor = np.zeros(len(gross_profit))
+        np.divide(gross_profit, gross_loss, out=profit_factor, where=gross_loss > 0)
+        profit_factor[(gross_loss <= 0) & (gross_profit > 0)] = np.inf
+        
+        return profit_factor.round(2)
     
     def get_strategy_metrics(self, df: pd.DataFrame = None) -> pd.DataFrame:
         """
@@ -179,22 +628,7 @@ class BacktestDataLoader:
         if df.empty:
             return pd.DataFrame()
         
-        metrics = df.groupby('strategy_name').agg({
-            'PNL': ['sum', 'mean', 'median', 'std', 'count'],
-            'PNL_percentage': ['mean', 'median', 'std'],
-            'holding_period': ['mean', 'median'],
-            'fee': ['sum', 'mean', 'median'],
-            'is_profitable': 'sum'
-        }).round(4)
-        
-        # Упрощаем названия колонок
-        metrics.columns = [
-            'total_pnl', 'avg_pnl', 'median_pnl', 'std_pnl', 'trades_count',
-            'avg_pnl_pct', 'median_pnl_pct', 'std_pnl_pct',
-            'avg_holding_hours', 'median_holding_hours',
-            'total_fees', 'avg_fee', 'median_fee',
-            'profitable_trades'
-        ]
+        metrics = _group_metrics(df, 'strategy_name')
         
         # Добавляем дополнительные метрики
         metrics['win_rate'] = (metrics['profitable_trades'] / metrics['trades_count'] * 100).round(2)
@@ -202,30 +636,10 @@ class BacktestDataLoader:
         # Сбрасываем индекс, чтобы strategy_name стала обычной колонкой
         metrics = metrics.reset_index()
         
-        # Вычисляем профит-фактор для каждой стратегии отдельно
-        profit_factors = []
-        for strategy in metrics['strategy_name']:
-            strategy_df = df[df['strategy_name'] == strategy]
-            gross_profit = strategy_df[strategy_df['PNL'] > 0]['PNL'].sum()
-            gross_loss = abs(strategy_df[strategy_df['PNL'] < 0]['PNL'].sum())
-            
-            if gross_loss > 0:
-                profit_factor = gross_profit / gross_loss
-            else:
-                profit_factor = float('inf') if gross_profit > 0 else 0
-            
-            profit_factors.append(round(profit_factor, 2))
-        
-        metrics['profit_factor'] = profit_factors
-        
-        # Вычисляем математическое ожидание (ожидаемая прибыль на сделку)
-        expected_values = []
-        for strategy in metrics['strategy_name']:
-            strategy_df = df[df['strategy_name'] == strategy]
-            expected_value = strategy_df['PNL'].mean()
-            expected_values.append(round(expected_value, 4))
-        
-        metrics['expected_value'] = expected_values
+        # Профит-фактор по группам
+        metrics['profit_factor'] = self._profit_factor_by(df, 'strategy_name')
+        # Математическое ожидание прибыли на сделку совпадает со средним PNL
+        metrics['expected_value'] = metrics['avg_pnl'].round(4)
         
         return metrics
     
@@ -245,22 +659,7 @@ class BacktestDataLoader:
         if df.empty:
             return pd.DataFrame()
         
-        metrics = df.groupby('symbol').agg({
-            'PNL': ['sum', 'mean', 'median', 'std', 'count'],
-            'PNL_percentage': ['mean', 'median', 'std'],
-            'holding_period': ['mean', 'median'],
-            'fee': ['sum', 'mean', 'median'],
-            'is_profitable': 'sum'
-        }).round(4)
-        
-        # Упрощаем названия колонок
-        metrics.columns = [
-            'total_pnl', 'avg_pnl', 'median_pnl', 'std_pnl', 'trades_count',
-            'avg_pnl_pct', 'median_pnl_pct', 'std_pnl_pct',
-            'avg_holding_hours', 'median_holding_hours',
-            'total_fees', 'avg_fee', 'median_fee',
-            'profitable_trades'
-        ]
+        metrics = _group_metrics(df, 'symbol')
         
         # Добавляем дополнительные метрики
         metrics['win_rate'] = (metrics['profitable_trades'] / metrics['trades_count'] * 100).round(2)
@@ -268,28 +667,10 @@ class BacktestDataLoader:
         # Сбрасываем индекс, чтобы symbol стала обычной колонкой
         metrics = metrics.reset_index()
         
-        # Вычисляем профит-фактор для каждого символа отдельно
-        profit_factors = []
-        expected_values = []
-        
-        for symbol in metrics['symbol']:
-            symbol_df = df[df['symbol'] == symbol]
-            gross_profit = symbol_df[symbol_df['PNL'] > 0]['PNL'].sum()
-            gross_loss = abs(symbol_df[symbol_df['PNL'] < 0]['PNL'].sum())
-            
-            if gross_loss > 0:
-                profit_factor = gross_profit / gross_loss
-            else:
-                profit_factor = float('inf') if gross_profit > 0 else 0
-            
-            profit_factors.append(round(profit_factor, 2))
-            
-            # Математическое ожидание
-            expected_value = symbol_df['PNL'].mean()
-            expected_values.append(round(expected_value, 4))
-        
-        metrics['profit_factor'] = profit_factors
-        metrics['expected_value'] = expected_values
+        # Профит-фактор по группам
+        metrics['profit_factor'] = self._profit_factor_by(df, 'symbol')
+        # Математическое ожидание прибыли на сделку совпадает со средним PNL
+        metrics['expected_value'] = metrics['avg_pnl'].round(4)
         
         return metrics
     
@@ -309,14 +690,16 @@ class BacktestDataLoader:
         if df.empty:
             return pd.DataFrame()
         
-        # Сортируем по времени закрытия
-        df_sorted = df.sort_values('closed_at').copy()
-        
-        # Вычисляем накопленный PNL
-        df_sorted['cumulative_pnl'] = df_sorted['PNL'].cumsum()
-        df_sorted['trade_number'] = range(1, len(df_sorted) + 1)
+        # Данные загрузчика уже отсортированы по времени закрытия; сортируем только чужие срезы
+        if not df['closed_at'].is_monotonic_increasing:
+            df = df.sort_values('closed_at', kind='stable')
         
-        return df_sorted[['closed_at', 'trade_number', 'PNL', 'cumulative_pnl', 'symbol', 'strategy_name']]
+        # Вычисляем накопленный PNL одним проходом по массиву, без копии всего DataFrame;
+        # сумма накапливается в float64, чтобы конец кривой совпадал с общим PNL
+        return df[['closed_at', 'PNL', 'symbol', 'strategy_name']].assign(
+            trade_number=np.arange(1, len(df) + 1, dtype=np.int32),
+            cumulative_pnl=np.cumsum(df['PNL'].to_numpy(), dtype=np.float64)
+        )[['closed_at', 'trade_number', 'PNL', 'cumulative_pnl', 'symbol', 'strategy_name']]
     
     def get_overall_metrics(self, df: pd.DataFrame = None) -> Dict[str, Any]:
         """
@@ -334,22 +717,27 @@ class BacktestDataLoader:
         if df.empty:
             return {}
         
-        # Базовые метрики
+        # Все метрики считаются по одному numpy-массиву PNL без промежуточных срезов DataFrame;
+        # суммы накапливаются в float64, чтобы не терять точность на float32-колонке.
+        # Пропуски PNL отбрасываются один раз, как в редукциях pandas (skipna)
         total_trades = len(df)
-        total_pnl = df['PNL'].sum()
-        avg_pnl = df['PNL'].mean()
-        median_pnl = df['PNL'].median()
-        std_pnl = df['PNL'].std()
+        pnl = df['PNL'].to_numpy()
+        pnl = pnl[~np.isnan(pnl)]
+        valid_trades = len(pnl)
+        total_pnl = float(pnl.sum(dtype=np.float64))
+        avg_pnl = total_pnl / valid_trades if valid_trades else float('nan')
+        median_pnl = float(np.median(pnl)) if valid_trades else float('nan')
+        std_pnl = float(pnl.std(dtype=np.float64, ddof=1)) if valid_trades > 1 else float('nan')
         
         # Прибыльные и убыточные сделки
-        profitable_trades = df[df['PNL'] > 0]
-        losing_trades = df[df['PNL'] < 0]
+        profitable_mask = pnl > 0
+        profitable_count = int(np.count_nonzero(profitable_mask))
         
-        win_rate = (len(profitable_trades) / total_trades * 100) if total_trades > 0 else 0
+        win_rate = profitable_count / total_trades * 100
         
         # Профит-фактор
-        gross_profit = profitable_trades['PNL'].sum() if not profitable_trades.empty else 0
-        gross_loss = abs(losing_trades['PNL'].sum()) if not losing_trades.empty else 0
+        gross_profit = float(pnl.sum(dtype=np.float64, where=profitable_mask))
+        gross_loss = abs(float(pnl.sum(dtype=np.float64, where=pnl < 0)))
         
         if gross_loss > 0:
             profit_factor = gross_profit / gross_loss
@@ -360,8 +748,8 @@ class BacktestDataLoader:
         expected_value = avg_pnl
         
         # Дополнительные метрики
-        max_profit = df['PNL'].max()
-        max_loss = df['PNL'].min()
+        max_profit = float(pnl.max()) if valid_trades else float('nan')
+        max_loss = float(pnl.min()) if valid_trades else float('nan')
         
         # Коэффициент Шарпа (упрощенный)
         sharpe_ratio = (avg_pnl / std_pnl) if std_pnl > 0 else 0
@@ -6,6 +6,16 @@
 import subprocess
 import sys
 import os
+import threading
+
+def _warm_caches(stop_event: threading.Event):
+    """Строит Parquet-кэш папок с данными. Ошибки не мешают запуску приложения."""
+    try:
+        from data_loader import warm_parquet_caches
+        folders = warm_parquet_caches(stop_event=stop_event)
+        print(f"🗄️  Кэш данных готов для папок: {len(folders)}")
+    except Exception as e:
+        print(f"⚠️  Не удалось подготовить кэш данных: {e}")
 
 def main():
     """Запускает Streamlit-приложение."""
@@ -27,6 +37,13 @@ def main():
     print("⏹️  Для остановки нажмите Ctrl+C")
     print("-" * 50)
     
+    # Пока Streamlit стартует, в фоне обновляем Parquet-кэш папок с данными,
+    # чтобы первый сеанс не разбирал JSON-файлы. Поток не daemon: при остановке
+    # он дописывает текущую папку и завершается, не оставляя кэш недописанным
+    stop_warming = threading.Event()
+    warm_thread = threading.Thread(target=_warm_caches, args=(stop_warming,))
+    warm_thread.start()
+    
     try:
         # Запускаем Streamlit
         subprocess.run([
@@ -39,6 +56,11 @@ def main():
     except Exception as e:
         print(f"❌ Ошибка при запуске: {e}")
         sys.exit(1)
+    finally:
+        stop_warming.set()
+        if warm_thread.is_alive():
+            print("⏳ Завершаем подготовку кэша данных...")
+            warm_thread.join()
 
 if __name__ == "__main__":
     main()
@@ -8,15 +8,242 @@ from plotly.subplots import make_subplots
 import pandas as pd
 from typing import List, Dict, Any
 import numpy as np
+import os
+import sys
+import json
+import time
+import tracemalloc
+import functools
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Отбирает точки ряда алгоритмом LTTB (Largest-Triangle-Three-Buckets).
+    
+    Алгоритм сохраняет визуальную форму ряда: первая и последняя точки остаются,
+    а из каждой промежуточной корзины берется точка, образующая треугольник
+    наибольшей площади с предыдущей выбранной точкой и средним следующей корзины.
+    
+    Args:
+        x: Значения по оси X (числа или datetime64)
+        y: Значения по оси Y
+        n_out: Желаемое количество точек
+        
+    Returns:
+        np.ndarray: Отсортированные индексы выбранных точек
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.view('i8')
+    x = x.astype(np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    
+    # Границы n_out - 2 промежуточных корзин по точкам 1..n-2
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) -
+            (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        indices[i + 1] = a
+    
+    return indices
+
+
+# Пунктирная горизонтальная линия на уровне 0 (аналог fig.add_hline(y=0) без валидации)
+ZERO_LINE = {
+    'type': 'line', 'xref': 'x domain', 'x0': 0, 'x1': 1, 'yref': 'y', 'y0': 0, 'y1': 0,
+    'line': {'color': 'gray', 'dash': 'dash'}, 'opacity': 0.5
+}
+
+# Цвета точек по знаку PNL: индекс 0 - убыток (и ноль), 1 - прибыль
+SIGN_COLORS = np.array(['red', 'green'])
+
+# Профилирование построения графиков включается переменной окружения PROFILE_PLOTS=1
+PROFILE_PLOTS = os.environ.get('PROFILE_PLOTS') == '1'
+
+
+@contextmanager
+def _timer(name: str, **fields):
+    """
+    Замеряет время и выделенную память блока и пишет JSON-строку в stderr.
+    
+    Args:
+        name: Имя замеряемого блока (обычно имя метода)
+        **fields: Дополнительные поля записи (например, число строк)
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    mem_before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        elapsed_ns = time.perf_counter_ns() - start
+        mem_after, mem_peak = tracemalloc.get_traced_memory()
+        record = {
+            'method': name,
+            **fields,
+            'elapsed_ns': elapsed_ns,
+            'alloc_bytes': mem_after - mem_before,
+            'peak_bytes': mem_peak - mem_before
+        }
+        print(json.dumps(record, ensure_ascii=False), file=sys.stderr)
+
+
+def _profiled(method):
+    """
+    Оборачивает метод построения графика в _timer, если включен PROFILE_PLOTS.
+    
+    Без PROFILE_PLOTS метод возвращается как есть и не несет накладных расходов.
+    
+    Args:
+        method: Метод вида method(self, df, ...)
+        
+    Returns:
+        Исходный или обернутый метод
+    """
+    if not PROFILE_PLOTS:
+        return method
+    
+    @functools.wraps(method)
+    def wrapper(self, df, *args, **kwargs):
+        with _timer(method.__name__, rows=len(df)):
+            return method(self, df, *args, **kwargs)
+    
+    return wrapper
 
 
 class BacktestVisualizer:
     """Класс для создания визуализаций результатов бэктестов."""
     
+    # Максимальное количество точек в одном ряду графика; длинные ряды прореживаются LTTB
+    MAX_PLOT_POINTS = 2000
+    
+    # Количество столбцов гистограммы времени удержания
+    HISTOGRAM_BINS = 30
+    
+    # Выше этого числа сделок точки на графике PNL по времени заменяются суммами по интервалам
+    MAX_SCATTER_POINTS = 20000
+    
+    # Количество наборов данных, отсортированные версии которых хранятся между вызовами plot_*
+    SORTED_CACHE_SIZE = 4
+    
+    # Шаблоны layout графиков: собираются один раз, в методах добавляется только заголовок
+    _LAYOUT_PNL_BY_TRADES = {
+        'xaxis': {'title': {'text': 'Номер сделки'}},
+        'yaxis': {'title': {'text': 'PNL (USDT)'}},
+        'hovermode': 'x unified',
+        'showlegend': True,
+        'height': 400
+    }
+    _LAYOUT_CUMULATIVE_PNL = {
+        'xaxis': {'title': {'text': 'Номер сделки'}},
+        'yaxis': {'title': {'text': 'Накопленный PNL (USDT)'}},
+        'hovermode': 'x unified',
+        'height': 400,
+        # Горизонтальная линия на уровне 0
+        'shapes': [ZERO_LINE]
+    }
+    _LAYOUT_PNL_DISTRIBUTION = {
+        'xaxis': {'title': {'text': 'Стратегия'}},
+        'yaxis': {'title': {'text': 'PNL (USDT)'}},
+        'height': 500,
+        'showlegend': False
+    }
+    _LAYOUT_PNL_TIMELINE = {
+        'xaxis': {'title': {'text': 'Время'}},
+        'yaxis': {'title': {'text': 'PNL (USDT)'}},
+        'hovermode': 'x unified',
+        'height': 500
+    }
+    _LAYOUT_WIN_RATE = {
+        'xaxis': {'title': {'text': 'Стратегия'}},
+        'yaxis': {'title': {'text': 'Процент прибыльных сделок (%)'}},
+        'height': 400
+    }
+    _LAYOUT_HOLDING_PERIOD = {
+        'xaxis': {'title': {'text': 'Время удержания (часы)'}},
+        'yaxis': {'title': {'text': 'Количество сделок'}},
+        'height': 400
+    }
+    
     def __init__(self):
         """Инициализация визуализатора."""
-        pass
+        # LRU-кэш отсортированных данных: ключ -> (исходный DataFrame, массивы колонок)
+        self._sorted_cache = OrderedDict()
     
+    def _get_sorted(self, df: pd.DataFrame) -> SimpleNamespace:
+        """
+        Возвращает массивы колонок, упорядоченные по времени закрытия, с накопленным PNL.
+        
+        Результат кэшируется по идентичности DataFrame и его отпечатку (длина, первое
+        и последнее closed_at), поэтому графики одного набора данных сортируют его
+        только один раз. На DataFrame хранится слабая ссылка. Массивы общие для всех графиков и не изменяются.
+        
+        Args:
+            df: DataFrame с данными сделок
+            
+        Returns:
+            SimpleNamespace: numpy-массивы closed_at, pnl, cum_pnl, is_profit и strategy
+        """
+        closed_at = df['closed_at']
+        key = (id(df), len(df), closed_at.iloc[0], closed_at.iloc[-1])
+        entry = self._sorted_cache.get(key)
+        # В кэше лежит слабая ссылка: если DataFrame уже удален, его id мог достаться другому объекту
+        if entry is not None and entry[0]() is df:
+            self._sorted_cache.move_to_end(key)
+            return entry[1]
+        
+        closed_at_values = closed_at.to_numpy()
+        pnl = df['PNL'].to_numpy()
+        strategy = df['strategy_name'].to_numpy()
+        
+        # Данные из загрузчика приложения уже отсортированы по closed_at; иначе сортируем
+        # int64-представление времени и переставляем только нужные массивы, без DataFrame
+        if not closed_at.is_monotonic_increasing:
+            order = np.argsort(closed_at_values.view('i8'), kind='stable')
+            closed_at_values, pnl, strategy = closed_at_values[order], pnl[order], strategy[order]
+        
+        sorted_data = SimpleNamespace(
+            closed_at=closed_at_values,
+            pnl=pnl,
+            cum_pnl=np.cumsum(pnl, dtype=np.float64),
+            # Маска прибыльных сделок считается один раз вместе с накопленным PNL
+            # и переиспользуется для цветов точек во всех графиках
+            is_profit=pnl > 0,
+            strategy=strategy
+        )
+        
+        # Кэш не удерживает DataFrame: когда st.cache_resource вытесняет отфильтрованный срез,
+        # запись удаляется вместе с массивами, которые могут ссылаться на его память
+        cache = self._sorted_cache
+        self._sorted_cache[key] = (weakref.ref(df, lambda _, key=key: cache.pop(key, None)), sorted_data)
+        while len(self._sorted_cache) > self.SORTED_CACHE_SIZE:
+            self._sorted_cache.popitem(last=False)
+        return sorted_data
+    
+    @_profiled
     def plot_pnl_by_trades(self, df: pd.DataFrame, title: str = "PNL по сделкам") -> go.Figure:
         """
         Создает график PNL по сделкам.
@@ -32,45 +259,32 @@ class BacktestVisualizer:
             return go.Figure()
         
         # Сортируем по времени закрытия
-        df_sorted = df.sort_values('closed_at').copy()
-        df_sorted['trade_number'] = range(1, len(df_sorted) + 1)
-        
-        # Создаем график
-        fig = go.Figure()
-        
-        # Добавляем столбцы для прибыльных и убыточных сделок
-        profitable_trades = df_sorted[df_sorted['PNL'] > 0]
-        losing_trades = df_sorted[df_sorted['PNL'] <= 0]
-        
-        if not profitable_trades.empty:
-            fig.add_trace(go.Bar(
-                x=profitable_trades['trade_number'],
-                y=profitable_trades['PNL'],
-                name='Прибыльные сделки',
-                marker_color='green',
-                opacity=0.7
-            ))
-        
-        if not losing_trades.empty:
-            fig.add_trace(go.Bar(
-                x=losing_trades['trade_number'],
-                y=losing_trades['PNL'],
-                name='Убыточные сделки',
-                marker_color='red',
-                opacity=0.7
-            ))
-        
-        fig.update_layout(
-            title=title,
-            xaxis_title='Номер сделки',
-            yaxis_title='PNL (USDT)',
-            hovermode='x unified',
-            showlegend=True,
-            height=400
-        )
-        
-        return fig
+        s = self._get_sorted(df)
+        pnl, is_profit = s.pnl, s.is_profit
+        trade_number = np.arange(1, len(pnl) + 1, dtype=np.int32)
+        
+        # Прореживаем длинные ряды, сохраняя форму графика
+        if len(pnl) > self.MAX_PLOT_POINTS:
+            idx = lttb_indices(trade_number, pnl, self.MAX_PLOT_POINTS)
+            trade_number, pnl, is_profit = trade_number[idx], pnl[idx], is_profit[idx]
+        
+        # Один ряд столбцов: цвет каждого столбца задается по знаку PNL, без разбиения данных
+        colors = SIGN_COLORS[is_profit.view(np.uint8)]
+        
+        data = [{
+            'type': 'bar',
+            'x': trade_number,
+            'y': pnl.astype(np.float32, copy=False),
+            'name': 'PNL сделки',
+            'marker': {'color': colors},
+            'opacity': 0.7,
+            'showlegend': False
+        }]
+        layout = {**self._LAYOUT_PNL_BY_TRADES, 'title': {'text': title}}
+        
+        return go.Figure(data=data, layout=layout, _validate=False)
     
+    @_profiled
     def plot_cumulative_pnl(self, df: pd.DataFrame, title: str = "Накопленный PNL") -> go.Figure:
         """
         Создает график накопленного PNL.
@@ -86,34 +300,29 @@ class BacktestVisualizer:
             return go.Figure()
         
         # Сортируем по времени закрытия
-        df_sorted = df.sort_values('closed_at').copy()
-        df_sorted['cumulative_pnl'] = df_sorted['PNL'].cumsum()
-        df_sorted['trade_number'] = range(1, len(df_sorted) + 1)
-        
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatter(
-            x=df_sorted['trade_number'],
-            y=df_sorted['cumulative_pnl'],
-            mode='lines+markers',
-            name='Накопленный PNL',
-            line=dict(color='blue', width=2),
-            marker=dict(size=4)
-        ))
-        
-        # Добавляем горизонтальную линию на уровне 0
-        fig.add_hline(y=0, line_dash="dash", line_color="gray", opacity=0.5)
-        
-        fig.update_layout(
-            title=title,
-            xaxis_title='Номер сделки',
-            yaxis_title='Накопленный PNL (USDT)',
-            hovermode='x unified',
-            height=400
-        )
-        
-        return fig
+        s = self._get_sorted(df)
+        cum_pnl = s.cum_pnl
+        trade_number = np.arange(1, len(cum_pnl) + 1, dtype=np.int32)
+        
+        # Прореживаем длинные ряды, сохраняя форму графика
+        if len(cum_pnl) > self.MAX_PLOT_POINTS:
+            idx = lttb_indices(trade_number, cum_pnl, self.MAX_PLOT_POINTS)
+            trade_number, cum_pnl = trade_number[idx], cum_pnl[idx]
+        
+        data = [{
+            'type': 'scatter',
+            'x': trade_number,
+            'y': cum_pnl.astype(np.float32, copy=False),
+            'mode': 'lines+markers',
+            'name': 'Накопленный PNL',
+            'line': {'color': 'blue', 'width': 2},
+            'marker': {'size': 4}
+        }]
+        layout = {**self._LAYOUT_CUMULATIVE_PNL, 'title': {'text': title}}
+        
+        return go.Figure(data=data, layout=layout, _validate=False)
     
+    @_profiled
     def plot_pnl_distribution(self, df: pd.DataFrame, title: str = "Распределение PNL по стратегиям") -> go.Figure:
         """
         Создает boxplot распределения PNL по стратегиям.
@@ -128,31 +337,32 @@ class BacktestVisualizer:
         if df.empty:
             return go.Figure()
         
-        fig = go.Figure()
-        
-        strategies = df['strategy_name'].unique()
-        
-        for strategy in strategies:
-            strategy_data = df[df['strategy_name'] == strategy]['PNL']
-            
-            fig.add_trace(go.Box(
-                y=strategy_data,
-                name=strategy,
-                boxpoints='outliers',
-                jitter=0.3,
-                pointpos=-1.8
-            ))
-        
-        fig.update_layout(
-            title=title,
-            xaxis_title='Стратегия',
-            yaxis_title='PNL (USDT)',
-            height=500,
-            showlegend=False
-        )
-        
-        return fig
+        # Группируем за один проход: коды стратегий в порядке появления, стабильная
+        # сортировка по коду и разрезание PNL на куски по числу сделок каждой стратегии
+        codes, strategies = pd.factorize(df['strategy_name'])
+        pnl = df['PNL'].to_numpy().astype(np.float32, copy=False)
+        # Сделки без стратегии (код -1) не попадают ни в один ящик
+        if (codes < 0).any():
+            known = codes >= 0
+            codes, pnl = codes[known], pnl[known]
+        order = np.argsort(codes, kind='stable')
+        pnl = pnl[order]
+        splits = np.cumsum(np.bincount(codes, minlength=len(strategies)))[:-1]
+        
+        # Отдельный trace на стратегию: в JSON не повторяется имя стратегии для каждой сделки
+        data = [{
+            'type': 'box',
+            'y': strategy_pnl,
+            'name': strategy,
+            'boxpoints': 'outliers',
+            'jitter': 0.3,
+            'pointpos': -1.8
+        } for strategy, strategy_pnl in zip(strategies, np.split(pnl, splits))]
+        layout = {**self._LAYOUT_PNL_DISTRIBUTION, 'title': {'text': title}}
+        
+        return go.Figure(data=data, layout=layout, _validate=False)
     
+    @_profiled
     def plot_strategy_comparison(self, df: pd.DataFrame, metrics: List[str] = None) -> go.Figure:
         """
         Создает сравнительный график стратегий по различным метрикам.
@@ -170,21 +380,12 @@ class BacktestVisualizer:
         if metrics is None:
             metrics = ['PNL_percentage', 'holding_period', 'fee']
         
-        # Вычисляем средние и медианные значения по стратегиям
-        strategy_stats = df.groupby('strategy_name').agg({
-            'PNL_percentage': ['mean', 'median'],
-            'holding_period': ['mean', 'median'],
-            'fee': ['mean', 'median']
-        }).round(4)
-        
-        # Упрощаем названия колонок
-        strategy_stats.columns = [
-            'avg_pnl_pct', 'median_pnl_pct',
-            'avg_holding_period', 'median_holding_period',
-            'avg_fee', 'median_fee'
-        ]
-        
-        strategy_stats = strategy_stats.reset_index()
+        # Вычисляем средние и медианные значения по стратегиям только для запрошенных метрик;
+        # округление до 4 знаков делает подсказка графика, а не копия агрегата
+        agg_spec = {metric: ['mean', 'median'] for metric in metrics}
+        strategy_stats = df.groupby('strategy_name', observed=True, sort=False).agg(agg_spec)
+        hovertemplate = '%{x}<br>%{y:.4f}'
+        strategies = strategy_stats.index
         
         # Создаем subplot
         fig = make_subplots(
@@ -193,26 +394,25 @@ class BacktestVisualizer:
             vertical_spacing=0.1
         )
         
+        # Колонки результата — MultiIndex (метрика, функция)
         for i, metric in enumerate(metrics, 1):
-            avg_col = f'avg_{metric}'
-            median_col = f'median_{metric}'
+            fig.add_trace(go.Bar(
+                x=strategies,
+                y=strategy_stats[(metric, 'mean')],
+                name=f'Среднее {metric}',
+                hovertemplate=hovertemplate,
+                marker_color='lightblue',
+                opacity=0.7
+            ), row=i, col=1)
             
-            if avg_col in strategy_stats.columns and median_col in strategy_stats.columns:
-                fig.add_trace(go.Bar(
-                    x=strategy_stats['strategy_name'],
-                    y=strategy_stats[avg_col],
-                    name=f'Среднее {metric}',
-                    marker_color='lightblue',
-                    opacity=0.7
-                ), row=i, col=1)
-                
-                fig.add_trace(go.Bar(
-                    x=strategy_stats['strategy_name'],
-                    y=strategy_stats[median_col],
-                    name=f'Медиана {metric}',
-                    marker_color='darkblue',
-                    opacity=0.7
-                ), row=i, col=1)
+            fig.add_trace(go.Bar(
+                x=strategies,
+                y=strategy_stats[(metric, 'median')],
+                name=f'Медиана {metric}',
+                hovertemplate=hovertemplate,
+                marker_color='darkblue',
+                opacity=0.7
+            ), row=i, col=1)
         
         fig.update_layout(
             title="Сравнительный анализ стратегий",
@@ -222,6 +422,47 @@ class BacktestVisualizer:
         
         return fig
     
+    def _binned_pnl_bar(self, closed_at: np.ndarray, pnl: np.ndarray, n_bins: int) -> dict:
+        """
+        Создает столбцы суммарного PNL по равным интервалам времени.
+        
+        Args:
+            closed_at: Отсортированные времена закрытия (datetime64)
+            pnl: PNL сделок в том же порядке
+            n_bins: Количество интервалов
+            
+        Returns:
+            dict: Описание bar-trace с суммой PNL и числом сделок по непустым интервалам
+        """
+        ts = closed_at.view('i8')
+        t0 = ts[0]
+        # Ширина интервала округляется вверх, чтобы последняя сделка попала в последний интервал
+        width = max((ts[-1] - t0) // n_bins + 1, 1)
+        bins = (ts - t0) // width
+        
+        sums = np.bincount(bins, weights=pnl, minlength=n_bins)
+        counts = np.bincount(bins, minlength=n_bins)
+        non_empty = counts > 0
+        
+        centers = (t0 + np.arange(n_bins) * width + width // 2).astype(closed_at.dtype)
+        sums = sums[non_empty].astype(np.float32)
+        return {
+            'type': 'bar',
+            'x': centers[non_empty],
+            'y': sums,
+            # Ширина столбца на оси дат задается в миллисекундах
+            'width': np.timedelta64(int(width), np.datetime_data(closed_at.dtype)[0]) / np.timedelta64(1, 'ms'),
+            'marker': {'color': np.where(sums > 0, 'green', 'red')},
+            'opacity': 0.7,
+            'customdata': counts[non_empty],
+            'hovertemplate': 'Время: %{x}<br>' +
+                             'PNL: %{y:.2f} USDT<br>' +
+                             'Сделок: %{customdata}<br>' +
+                             '<extra></extra>',
+            'name': 'PNL за интервал'
+        }
+    
+    @_profiled
     def plot_pnl_timeline(self, df: pd.DataFrame, title: str = "PNL по времени") -> go.Figure:
         """
         Создает график PNL по времени.
@@ -237,51 +478,57 @@ class BacktestVisualizer:
             return go.Figure()
         
         # Сортируем по времени закрытия
-        df_sorted = df.sort_values('closed_at').copy()
-        
-        fig = go.Figure()
-        
-        # Добавляем точки для каждой сделки
-        colors = ['green' if pnl > 0 else 'red' for pnl in df_sorted['PNL']]
-        
-        fig.add_trace(go.Scatter(
-            x=df_sorted['closed_at'],
-            y=df_sorted['PNL'],
-            mode='markers',
-            marker=dict(
-                color=colors,
-                size=8,
-                opacity=0.7
-            ),
-            text=df_sorted['strategy_name'],
-            hovertemplate='<b>%{text}</b><br>' +
-                         'Время: %{x}<br>' +
-                         'PNL: %{y:.2f} USDT<br>' +
-                         '<extra></extra>',
-            name='Сделки'
-        ))
+        s = self._get_sorted(df)
+        
+        # Прореживаем длинные ряды: точки и линия отбираются независимо
+        cumulative_idx = slice(None)
+        if len(s.pnl) > self.MAX_PLOT_POINTS:
+            cumulative_idx = lttb_indices(s.closed_at, s.cum_pnl, self.MAX_PLOT_POINTS)
+        
+        if len(s.pnl) > self.MAX_SCATTER_POINTS:
+            # Слишком плотное облако точек заменяем суммами PNL по равным интервалам времени
+            trades_trace = self._binned_pnl_bar(s.closed_at, s.pnl, self.MAX_PLOT_POINTS)
+        else:
+            # Добавляем точки для каждой сделки; цвета берутся из готовой маски знака PNL.
+            # Точки прореживаются только здесь: для столбцов по интервалам LTTB не нужен
+            trades_idx = slice(None)
+            if len(s.pnl) > self.MAX_PLOT_POINTS:
+                trades_idx = lttb_indices(s.closed_at, s.pnl, self.MAX_PLOT_POINTS)
+            trades_pnl = s.pnl[trades_idx]
+            colors = SIGN_COLORS[s.is_profit[trades_idx].view(np.uint8)]
+            
+            trades_trace = {
+                'type': 'scatter',
+                'x': s.closed_at[trades_idx],
+                'y': trades_pnl.astype(np.float32, copy=False),
+                'mode': 'markers',
+                'marker': {
+                    'color': colors,
+                    'size': 8,
+                    'opacity': 0.7
+                },
+                'text': s.strategy[trades_idx],
+                'hovertemplate': '<b>%{text}</b><br>' +
+                                 'Время: %{x}<br>' +
+                                 'PNL: %{y:.2f} USDT<br>' +
+                                 '<extra></extra>',
+                'name': 'Сделки'
+            }
         
         # Добавляем линию накопленного PNL
-        df_sorted['cumulative_pnl'] = df_sorted['PNL'].cumsum()
-        
-        fig.add_trace(go.Scatter(
-            x=df_sorted['closed_at'],
-            y=df_sorted['cumulative_pnl'],
-            mode='lines',
-            name='Накопленный PNL',
-            line=dict(color='blue', width=2)
-        ))
-        
-        fig.update_layout(
-            title=title,
-            xaxis_title='Время',
-            yaxis_title='PNL (USDT)',
-            hovermode='x unified',
-            height=500
-        )
-        
-        return fig
+        data = [trades_trace, {
+            'type': 'scatter',
+            'x': s.closed_at[cumulative_idx],
+            'y': s.cum_pnl[cumulative_idx].astype(np.float32, copy=False),
+            'mode': 'lines',
+            'name': 'Накопленный PNL',
+            'line': {'color': 'blue', 'width': 2}
+        }]
+        layout = {**self._LAYOUT_PNL_TIMELINE, 'title': {'text': title}}
+        
+        return go.Figure(data=data, layout=layout, _validate=False)
     
+    @_profiled
     def plot_win_rate_by_strategy(self, df: pd.DataFrame, title: str = "Процент прибыльных сделок по стратегиям") -> go.Figure:
         """
         Создает график процента прибыльных сделок по стратегиям.
@@ -296,34 +543,31 @@ class BacktestVisualizer:
         if df.empty:
             return go.Figure()
         
-        # Вычисляем процент прибыльных сделок по стратегиям
-        win_rates = df.groupby('strategy_name').agg({
-            'is_profitable': ['sum', 'count']
-        })
-        
-        win_rates.columns = ['profitable_trades', 'total_trades']
-        win_rates['win_rate'] = (win_rates['profitable_trades'] / win_rates['total_trades'] * 100).round(2)
-        win_rates = win_rates.reset_index()
-        
-        fig = go.Figure()
-        
-        fig.add_trace(go.Bar(
-            x=win_rates['strategy_name'],
-            y=win_rates['win_rate'],
-            marker_color='lightgreen',
-            text=win_rates['win_rate'].astype(str) + '%',
-            textposition='auto'
-        ))
-        
-        fig.update_layout(
-            title=title,
-            xaxis_title='Стратегия',
-            yaxis_title='Процент прибыльных сделок (%)',
-            height=400
-        )
-        
-        return fig
+        # Вычисляем процент прибыльных сделок по стратегиям: коды стратегий + np.bincount
+        codes, strategies = pd.factorize(df['strategy_name'], sort=True)
+        is_profitable = df['is_profitable'].to_numpy(dtype=np.float64)
+        # Сделки без стратегии (код -1) не учитываются, как и в groupby
+        if (codes < 0).any():
+            known = codes >= 0
+            codes, is_profitable = codes[known], is_profitable[known]
+        profitable_trades = np.bincount(codes, weights=is_profitable, minlength=len(strategies))
+        total_trades = np.bincount(codes, minlength=len(strategies))
+        win_rate = np.round(profitable_trades / total_trades * 100, 2)
+        
+        data = [{
+            'type': 'bar',
+            'x': np.asarray(strategies),
+            'y': win_rate,
+            'marker': {'color': 'lightgreen'},
+            # Стратегий немного, поэтому подписи проще собрать f-строками
+            'text': [f"{rate:.2f}%" for rate in win_rate],
+            'textposition': 'auto'
+        }]
+        layout = {**self._LAYOUT_WIN_RATE, 'title': {'text': title}}
+        
+        return go.Figure(data=data, layout=layout, _validate=False)
     
+    @_profiled
     def plot_holding_period_distribution(self, df: pd.DataFrame, title: str = "Распределение времени удержания") -> go.Figure:
         """
         Создает гистограмму распределения времени удержания.
@@ -338,23 +582,28 @@ class BacktestVisualizer:
         if df.empty:
             return go.Figure()
         
-        # Конвертируем в часы
-        holding_hours = df['holding_period'] / 3600
-        
-        fig = go.Figure()
-        
-        fig.add_trace(go.Histogram(
-            x=holding_hours,
-            nbinsx=30,
-            marker_color='lightblue',
-            opacity=0.7
-        ))
+        # Конвертируем в часы; пропуски не учитываются, как в go.Histogram
+        holding_hours = df['holding_period'].to_numpy(dtype=np.float64) / 3600
+        holding_hours = holding_hours[np.isfinite(holding_hours)]
+        if holding_hours.size == 0:
+            return go.Figure()
         
-        fig.update_layout(
-            title=title,
-            xaxis_title='Время удержания (часы)',
-            yaxis_title='Количество сделок',
-            height=400
+        # Гистограмму считаем на сервере: в браузер уходят только HISTOGRAM_BINS столбцов.
+        # Границы берутся по фактическим значениям, поэтому отрицательные длительности не теряются
+        counts, edges = np.histogram(
+            holding_hours, bins=self.HISTOGRAM_BINS, range=(holding_hours.min(), holding_hours.max())
         )
         
-        return fig
+        data = [{
+            'type': 'bar',
+            'x': (edges[:-1] + edges[1:]) / 2,
+            'y': counts,
+            'width': np.diff(edges),
+            'customdata': np.column_stack([edges[:-1], edges[1:]]),
+            'hovertemplate': '%{customdata[0]:.1f}–%{customdata[1]:.1f} ч: %{y}<extra></extra>',
+            'marker': {'color': 'lightblue'},
+            'opacity': 0.7
+        }]
+        layout = {**self._LAYOUT_HOLDING_PERIOD, 'title': {'text': title}}
+        
+        return go.Figure(data=data, layout=layout, _validate=False)